@@ -0,0 +1,243 @@
+"""Walk-forward backtest of the /predict model over the stocks.csv universe.
+
+The model behind /predict maps one day's Open/High/Low/Close/Volume to the
+next day's close-to-close return (main.download_and_preprocess_data uses the
+same label as make_dataset here). Here it is scored the only honest way for a time series: trained on
+the past and evaluated on the days that follow, refitting every --step days
+on either a rolling window (--mode rolling) or all history so far
+(--mode expanding).
+
+Prices for the whole universe are downloaded in one batch and each ticker is
+evaluated in a worker process. The "linear" model fits every window at once
+with batched least squares over cumulative sums; any other model (anything
+with scikit-learn's fit/predict) is refit window by window on array views.
+
+    python backtest.py --models linear,ridge,zero --mode expanding --step 5
+"""
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+from sklearn.dummy import DummyRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+FEATURE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Models evaluated by refitting per window; "linear" is handled by linear_walk_forward()
+MODELS = {
+    'linear': LinearRegression,
+    'ridge': lambda: make_pipeline(StandardScaler(), Ridge(alpha=10.0)),
+    'mean': lambda: DummyRegressor(strategy='mean'),
+    'zero': lambda: DummyRegressor(strategy='constant', constant=0.0),
+}
+
+
+def register_model(name, factory):
+    """Make a model available to --models; factory() must return a fit/predict estimator."""
+    MODELS[name] = factory
+
+
+def load_universe(path='stocks.csv'):
+    stocks = pd.read_csv(path).dropna(subset=['symbol'])
+    return list(dict.fromkeys(stocks['symbol'].str.strip()))
+
+
+def download_universe(symbols, start, end):
+    """One batched download; returns {symbol: (days x 5) OHLCV array}."""
+    data = yf.download(symbols if len(symbols) > 1 else symbols[0], start=start, end=end, progress=False)
+    prices = {}
+    for symbol in symbols:
+        try:
+            if isinstance(data.columns, pd.MultiIndex):
+                frame = pd.DataFrame({column: data[column][symbol] for column in FEATURE_COLUMNS})
+            else:
+                # A single ticker comes back with flat OHLCV columns
+                frame = data[FEATURE_COLUMNS].copy()
+        except KeyError:
+            logger.error(f"No price history found for {symbol}")
+            continue
+        frame = frame.ffill().dropna()
+        if len(frame):
+            prices[symbol] = frame.to_numpy(dtype=float)
+    return prices
+
+
+def make_dataset(ohlcv):
+    """Features for day t and the return from day t to day t+1."""
+    close = ohlcv[:, 3]
+    labels = close[1:] / close[:-1] - 1
+    return ohlcv[:-1], labels
+
+
+def refit_points(n, train_window, step, mode):
+    """Indices at which the model is refit; each one predicts the next `step` days."""
+    points = np.arange(train_window, n, step)
+    if mode == 'rolling':
+        starts = points - train_window
+    else:
+        starts = np.zeros_like(points)
+    return starts, points
+
+
+def linear_walk_forward(features, labels, train_window, step, mode):
+    """Ordinary least squares refit at every point in one batched solve."""
+    # Predictions are invariant to affine rescaling of the features, so scaling
+    # by global statistics only improves conditioning and leaks nothing.
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1
+    X = np.hstack([np.ones((len(features), 1)), (features - features.mean(axis=0)) / scale])
+    n, k = X.shape
+
+    starts, ends = refit_points(n, train_window, step, mode)
+    if not len(ends):
+        return np.empty(0), np.empty(0, dtype=int)
+    # Cumulative X'X and X'y give every window's normal equations by subtraction
+    xtx = np.concatenate([np.zeros((1, k, k)), np.cumsum(X[:, :, None] * X[:, None, :], axis=0)])
+    xty = np.concatenate([np.zeros((1, k)), np.cumsum(X * labels[:, None], axis=0)])
+    coefficients = np.einsum('wij,wj->wi', np.linalg.pinv(xtx[ends] - xtx[starts], rcond=1e-12),
+                             xty[ends] - xty[starts])
+
+    test_days = np.arange(ends[0], n)
+    window = (test_days - ends[0]) // step
+    predictions = np.einsum('dk,dk->d', X[test_days], coefficients[window])
+    return predictions, test_days
+
+
+def generic_walk_forward(factory, features, labels, train_window, step, mode):
+    n = len(features)
+    starts, ends = refit_points(n, train_window, step, mode)
+    if not len(ends):
+        return np.empty(0), np.empty(0, dtype=int)
+    test_blocks = np.lib.stride_tricks.sliding_window_view(np.arange(n + step - 1), step)[ends]
+    predictions = []
+    for start, end, block in zip(starts, ends, test_blocks):
+        block = block[block < n]
+        model = factory()
+        model.fit(features[start:end], labels[start:end])
+        predictions.append(model.predict(features[block]))
+    test_days = np.arange(ends[0], n)
+    return np.concatenate(predictions), test_days
+
+
+def score(predictions, actual):
+    errors = predictions - actual
+    moved = actual != 0
+    return {
+        'n': int(len(actual)),
+        'mae': float(np.abs(errors).mean()),
+        'rmse': float(np.sqrt((errors ** 2).mean())),
+        'hit_rate': float((np.sign(predictions[moved]) == np.sign(actual[moved])).mean()) if moved.any() else float('nan'),
+    }
+
+
+def evaluate_ticker(symbol, ohlcv, model_names, train_window, step, mode):
+    """Runs in a worker process: walk-forward scores for every model on one ticker."""
+    features, labels = make_dataset(ohlcv)
+    results = []
+    for name in model_names:
+        started = time.perf_counter()
+        if name == 'linear':
+            predictions, test_days = linear_walk_forward(features, labels, train_window, step, mode)
+        else:
+            predictions, test_days = generic_walk_forward(MODELS[name], features, labels, train_window, step, mode)
+        if not len(test_days):
+            continue
+        row = {'ticker': symbol, 'model': name}
+        row.update(score(predictions, labels[test_days]))
+        row['seconds'] = time.perf_counter() - started
+        results.append(row)
+    return results
+
+
+def run_backtest(prices, model_names, train_window=252, step=5, mode='expanding', workers=None):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(evaluate_ticker, symbol, ohlcv, model_names, train_window, step, mode)
+                   for symbol, ohlcv in prices.items()]
+        rows = []
+        for future in futures:
+            rows.extend(future.result())
+    return pd.DataFrame(rows)
+
+
+def summarize(table):
+    """Per-model averages across tickers plus prediction-weighted hit rate."""
+    grouped = table.groupby('model')
+    summary = grouped[['mae', 'rmse', 'hit_rate']].mean()
+    summary['pooled_hit_rate'] = (table['hit_rate'] * table['n']).groupby(table['model']).sum() / grouped['n'].sum()
+    summary['tickers'] = grouped.size()
+    summary['predictions'] = grouped['n'].sum()
+    summary['model_seconds'] = grouped['seconds'].sum()
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Walk-forward backtest of the /predict model.')
+    parser.add_argument('--universe', default='stocks.csv')
+    parser.add_argument('--symbols', help='comma separated symbols instead of the whole universe')
+    parser.add_argument('--start', default='2020-01-01')
+    parser.add_argument('--end', default='2023-01-01')
+    parser.add_argument('--models', default='linear,zero', help=f"comma separated, from: {', '.join(MODELS)}")
+    parser.add_argument('--mode', choices=['expanding', 'rolling'], default='expanding')
+    parser.add_argument('--train-window', type=int, default=252,
+                        help='training days (initial days for expanding mode)')
+    parser.add_argument('--step', type=int, default=5, help='days predicted between refits')
+    parser.add_argument('--workers', type=int, default=None, help='process pool size (default: CPU count)')
+    parser.add_argument('--output', help='write per-ticker results to this .csv or .json file')
+    parser.add_argument('--offline', action='store_true',
+                        help='use the deterministic price stand-ins from benchmarks/stubs.py')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    model_names = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = [m for m in model_names if m not in MODELS]
+    if unknown:
+        raise SystemExit(f"Unknown model(s): {', '.join(unknown)}. Available: {', '.join(MODELS)}")
+    if args.offline:
+        from benchmarks import stubs
+        stubs.install({name: 0 for name in stubs.LATENCY})
+
+    symbols = args.symbols.split(',') if args.symbols else load_universe(args.universe)
+    started = time.perf_counter()
+    prices = download_universe(symbols, args.start, args.end)
+    downloaded = time.perf_counter()
+    logger.info(f"Downloaded {len(prices)}/{len(symbols)} tickers in {downloaded - started:.2f}s")
+
+    table = run_backtest(prices, model_names, args.train_window, args.step, args.mode, args.workers)
+    finished = time.perf_counter()
+    if table.empty:
+        raise SystemExit('Not enough history to evaluate any ticker.')
+
+    pd.set_option('display.width', 140)
+    pd.set_option('display.max_rows', None)
+    print(table.drop(columns='seconds').sort_values(['model', 'rmse']).to_string(index=False, float_format='{:.5f}'.format))
+    print()
+    print(summarize(table).to_string(float_format='{:.5f}'.format))
+    print()
+    evaluation = finished - downloaded
+    print(f"Evaluated {len(prices)} tickers x {len(model_names)} models ({table['n'].sum()} predictions) "
+          f"in {evaluation:.2f}s ({table['n'].sum() / evaluation:,.0f} predictions/s); "
+          f"total runtime {finished - started:.2f}s")
+
+    if args.output:
+        if args.output.endswith('.json'):
+            with open(args.output, 'w') as f:
+                json.dump({'config': vars(args), 'runtime_s': finished - started, 'evaluation_s': evaluation,
+                           'results': table.to_dict(orient='records')}, f, indent=2)
+        else:
+            table.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
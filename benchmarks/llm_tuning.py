@@ -0,0 +1,263 @@
+"""Sweep CTransformers runtime settings for the chat model on this machine.
+
+Every model file matched by --models (e.g. q4_0/q5_1/q8_0 GGML files dropped
+into models/) is loaded once per context length, in a fresh process so load
+time and resident memory are measured cleanly. Each combination of threads,
+batch size and max_new_tokens then answers the same fixed finance prompts,
+formatted with the bot's own prompt template. Reported per combination:
+load time, RSS after load and at peak, time to first token, decode
+tokens/sec and total response time. The fastest setup whose median response
+fits --latency-budget is printed as LLM_* lines for .env (see llm_config.py).
+
+    python -m benchmarks.llm_tuning --models 'models/*.bin' --threads 2,4,8 \
+        --batch-sizes 8,256 --context-lengths 512,2048 --max-new-tokens 128,256
+
+Quantization also changes answer quality, which this tool does not measure;
+the best setup per model file is listed so that trade-off stays visible.
+"""
+import argparse
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import re
+import resource
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import llm_config
+
+# Fixed prompts so runs on different machines and days stay comparable
+FINANCE_PROMPTS = [
+    'What is an index fund?',
+    'Explain SIP vs lump sum investing',
+    'How does inflation affect fixed deposit returns in India?',
+    'What is the difference between large cap and small cap stocks?',
+    'Should I repay my home loan early or invest in mutual funds?',
+    'Explain what a P/E ratio tells an investor',
+]
+BLOG_STYLE = 'Common People'
+
+
+def parse_list(text, cast):
+    return [cast(part.strip()) for part in text.split(',') if part.strip()]
+
+
+def quantization(path):
+    match = re.search(r'\.(q\d(?:_[0-9a-z]+)*|f16|f32)\.', Path(path).name.lower())
+    return match.group(1) if match else 'unknown'
+
+
+def rss_mb():
+    """Current resident set size of this process in MB."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def time_generation(llm, tokens, max_new_tokens, temperature, threads, batch_size, seed):
+    """Return (seconds to first token, generated token count, total seconds)."""
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for token in llm.generate(tokens, temperature=temperature, seed=seed, threads=threads,
+                              batch_size=batch_size, reset=True):
+        if first is None:
+            first = time.perf_counter()
+        if llm.is_eos_token(token):
+            break
+        count += 1
+        if count >= max_new_tokens:
+            break
+    finished = time.perf_counter()
+    return (first or finished) - started, count, finished - started
+
+
+def run_group(model, model_type, context_length, settings, prompts, temperature, repeats, seed):
+    """Load one model at one context length and time every (threads, batch size, max_new_tokens).
+
+    Runs in its own process so memory and load time are not skewed by earlier groups.
+    """
+    from ctransformers import AutoModelForCausalLM
+
+    base_rss = rss_mb()
+    started = time.perf_counter()
+    llm = AutoModelForCausalLM.from_pretrained(model, model_type=model_type, context_length=context_length)
+    load_s = time.perf_counter() - started
+    group = {
+        'model': model,
+        'quantization': quantization(model),
+        'context_length': context_length,
+        'load_s': round(load_s, 3),
+        'rss_loaded_mb': round(rss_mb() - base_rss, 1),
+    }
+    tokenized = [llm.tokenize(prompt) for prompt in prompts]
+
+    rows = []
+    for threads, batch_size, max_new_tokens in settings:
+        row = dict(group, threads=threads, batch_size=batch_size, max_new_tokens=max_new_tokens)
+        if max(len(tokens) for tokens in tokenized) + max_new_tokens > context_length:
+            row['skipped'] = 'prompt + max_new_tokens exceeds context_length'
+            rows.append(row)
+            continue
+        # Warm-up so the first timed prompt does not pay for thread start-up
+        time_generation(llm, tokenized[0], 4, temperature, threads, batch_size, seed)
+        ttfts, rates, totals, counts = [], [], [], []
+        for _ in range(repeats):
+            for tokens in tokenized:
+                ttft, count, total = time_generation(llm, tokens, max_new_tokens, temperature,
+                                                     threads, batch_size, seed)
+                ttfts.append(ttft)
+                totals.append(total)
+                counts.append(count)
+                if count > 1 and total > ttft:
+                    rates.append((count - 1) / (total - ttft))
+        row.update({
+            'p50_ttft_ms': round(statistics.median(ttfts) * 1000, 1),
+            'tokens_per_sec': round(statistics.median(rates), 2) if rates else 0.0,
+            'p50_total_s': round(statistics.median(totals), 3),
+            'max_total_s': round(max(totals), 3),
+            'mean_tokens': round(statistics.mean(counts), 1),
+            'rss_peak_mb': round(peak_rss_mb(), 1),
+        })
+        rows.append(row)
+    return rows
+
+
+def recommend(rows, latency_budget):
+    """Fastest decode among setups with the longest max_new_tokens that fits the latency budget."""
+    measured = [row for row in rows if 'skipped' not in row]
+    if not measured:
+        return None
+    within = [row for row in measured if row['p50_total_s'] <= latency_budget] or measured
+    longest = max(row['max_new_tokens'] for row in within)
+    candidates = [row for row in within if row['max_new_tokens'] == longest]
+    return max(candidates, key=lambda row: (row['tokens_per_sec'], -row['p50_ttft_ms']))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', default='models/*.bin',
+                        help='glob (or comma separated globs) of GGML model files to compare')
+    parser.add_argument('--model-type', default=llm_config.DEFAULT_MODEL_TYPE)
+    parser.add_argument('--threads', default=','.join(str(n) for n in sorted({1, 2, 4, os.cpu_count() or 1})),
+                        help='comma separated thread counts')
+    parser.add_argument('--batch-sizes', default='8,64,512')
+    parser.add_argument('--context-lengths', default='512,1024,2048')
+    parser.add_argument('--max-new-tokens', default='64,128,256')
+    parser.add_argument('--repeats', type=int, default=1, help='passes over the prompt set per setting')
+    parser.add_argument('--prompts', type=int, default=len(FINANCE_PROMPTS),
+                        help='use only the first N of the fixed finance prompts')
+    parser.add_argument('--latency-budget', type=float, default=30.0,
+                        help='median seconds per answer allowed for the recommended setup')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='llm_tuning.json')
+    return parser.parse_args(argv)
+
+
+def print_rows(rows):
+    print(f"{'quant':<8}{'ctx':>6}{'thr':>5}{'batch':>6}{'new':>5}{'load s':>8}{'rss MB':>8}"
+          f"{'ttft ms':>9}{'tok/s':>8}{'p50 s':>8}")
+    for row in rows:
+        if 'skipped' in row:
+            print(f"{row['quantization']:<8}{row['context_length']:>6}{row['threads']:>5}{row['batch_size']:>6}"
+                  f"{row['max_new_tokens']:>5}  skipped: {row['skipped']}")
+            continue
+        print(f"{row['quantization']:<8}{row['context_length']:>6}{row['threads']:>5}{row['batch_size']:>6}"
+              f"{row['max_new_tokens']:>5}{row['load_s']:>8.2f}{row['rss_loaded_mb']:>8.0f}"
+              f"{row['p50_ttft_ms']:>9.0f}{row['tokens_per_sec']:>8.2f}{row['p50_total_s']:>8.2f}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    models = sorted({path for pattern in args.models.split(',') for path in glob.glob(pattern.strip())})
+    if not models:
+        raise SystemExit(f"No model files match {args.models!r}")
+    try:
+        import ctransformers  # noqa: F401
+    except ImportError:
+        raise SystemExit("ctransformers is not installed: pip install ctransformers")
+
+    _, _, base_config = llm_config.load()
+    temperature = base_config['temperature']
+    prompts = [llm_config.PROMPT_TEMPLATE.format(blog_style=BLOG_STYLE, input_text=text)
+               for text in FINANCE_PROMPTS[:args.prompts]]
+    settings = list(itertools.product(parse_list(args.threads, int), parse_list(args.batch_sizes, int),
+                                      parse_list(args.max_new_tokens, int)))
+    context_lengths = parse_list(args.context_lengths, int)
+
+    rows = []
+    started = time.perf_counter()
+    for model, context_length in itertools.product(models, context_lengths):
+        print(f"{model} (context {context_length}): {len(settings)} settings", flush=True)
+        # A fresh spawned process per group, so each load starts from an empty address space
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            try:
+                rows.extend(pool.submit(run_group, model, args.model_type, context_length, settings, prompts,
+                                        temperature, args.repeats, args.seed).result())
+            except Exception as e:
+                print(f"  failed: {e}", flush=True)
+
+    best = recommend(rows, args.latency_budget)
+    per_model = {model: recommend([row for row in rows if row['model'] == model], args.latency_budget)
+                 for model in models}
+    print_rows(rows)
+    results = {
+        'rows': rows,
+        'best': best,
+        'best_per_model': per_model,
+        'config': {
+            'models': models,
+            'model_type': args.model_type,
+            'context_lengths': context_lengths,
+            'settings': len(settings),
+            'prompts': len(prompts),
+            'repeats': args.repeats,
+            'temperature': temperature,
+            'latency_budget_s': args.latency_budget,
+            'seed': args.seed,
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+        },
+        'sweep_time_s': round(time.perf_counter() - started, 1),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print(f'Results written to {args.output}')
+
+    if best is None:
+        print('No setting could be measured.')
+        return 1
+    for model, row in per_model.items():
+        if row is not None:
+            print(f"Best for {Path(model).name}: threads={row['threads']} batch_size={row['batch_size']} "
+                  f"context_length={row['context_length']} max_new_tokens={row['max_new_tokens']} "
+                  f"({row['tokens_per_sec']} tok/s, {row['p50_total_s']} s per answer)")
+    config = dict(base_config, threads=best['threads'], batch_size=best['batch_size'],
+                  context_length=best['context_length'], max_new_tokens=best['max_new_tokens'])
+    print('Recommended .env settings:')
+    for line in llm_config.to_env(best['model'], config):
+        print(f'    {line}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,330 @@
+"""Load test for the bot's handlers with every upstream stubbed out.
+
+Synthetic Telegram updates are pushed through the exact handlers that
+main.build_application() registers, at a fixed concurrency and command mix.
+Per-command p50/p95/p99 latency and updates/sec are written to a JSON file;
+pass --baseline to fail the run when it regresses past --threshold.
+Inline queries are typed one keystroke per --typing-interval; their latency
+is measured up to answerInlineQuery, and superseded keystrokes that were
+never answered are reported as 'debounced'.
+
+    python -m benchmarks.load_test --updates 500 --concurrency 16 \
+        --mix coin=3,stock=3,chat=1 --latency llm=0.5 --output bench.json
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import stubs
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Message texts sent for each command in the mix ('chat' is free text for the LLM)
+COMMAND_TEXTS = {
+    'start': ['/start'],
+    'help': ['/help'],
+    'coin': ['/coin bitcoin', '/coin eth', '/coin btc sol doge ada'],
+    'stock': ['/stock RELIANCE.BO', '/stock TCS.BO', '/stock AAPL'],
+    'forex': ['/forex USD INR', '/forex EUR INR'],
+    'market': ['/market'],
+    'budget_highlights': ['/budget_highlights'],
+    'finance_news': ['/finance_news'],
+    'request_otp': ['/request_otp bench@example.com'],
+    'predict': ['/predict INFY.BO', '/predict AAPL'],
+    'search': ['/search infosys', '/search tata'],
+    'portfolio': ['/portfolio show', '/portfolio risk', '/portfolio risk 1y'],
+    'screen': ['/screen rsi<30', '/screen close>sma50 ema20>ema50 top=5', '/screen 52w_breakout'],
+    'chart': ['/chart RELIANCE.BO', '/chart TCS.BO 1y', '/chart INFY.BO', '/chart HDFCBANK.BO 3mo'],
+    # Inline queries: each entry is typed one keystroke at a time (see --typing-interval)
+    'inline': ['infy', 'reliance', 'bitcoin', 'tata motors', 'hdfc', 'eth', 'apple'],
+    'chat': ['What is an index fund?', 'Explain SIP vs lump sum investing'],
+    # Free text that the intent router answers without the LLM
+    'routed_chat': ['help', 'usd to inr', 'price of infy', 'budget highlights', 'btc price'],
+}
+
+# Holdings seeded for every benchmark user
+PORTFOLIO_SIZE = 20
+
+DEFAULT_MIX = 'coin=3,stock=3,forex=2,search=2,predict=1,market=1,budget_highlights=1,finance_news=1,chat=1'
+
+# Metrics compared against the baseline: name -> True if higher is worse
+REGRESSION_METRICS = {'p95_ms': True, 'p99_ms': True, 'updates_per_sec': False}
+
+
+def parse_pairs(text, cast):
+    pairs = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        key, _, value = item.partition('=')
+        pairs[key.strip()] = cast(value)
+    return pairs
+
+
+def build_workload(mix, count, seed):
+    unknown = set(mix) - set(COMMAND_TEXTS)
+    if unknown:
+        raise SystemExit(f"Unknown command(s) in mix: {', '.join(sorted(unknown))}")
+    rng = random.Random(seed)
+    commands = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [(command, rng.choice(COMMAND_TEXTS[command])) for command in commands]
+
+
+def seed_users(user_ids):
+    conn = sqlite3.connect('users.db')
+    conn.executemany(
+        'INSERT OR REPLACE INTO users (telegram_id, username, email, password_hash, is_verified, is_logged_in) '
+        'VALUES (?, ?, ?, ?, 1, 1)',
+        [(uid, f'bench{uid}', f'bench{uid}@example.com', 'x') for uid in user_ids])
+    # Every user holds a slice of the stocks.csv universe for /portfolio
+    symbols = [row['symbol'] for row in csv.DictReader(open('stocks.csv')) if row.get('symbol')]
+    conn.executemany(
+        'INSERT OR REPLACE INTO portfolio (telegram_id, symbol, quantity) VALUES (?, ?, ?)',
+        [(uid, symbols[(uid + i) % len(symbols)], 10 + i) for uid in user_ids for i in range(PORTFOLIO_SIZE)])
+    conn.commit()
+    conn.close()
+
+
+def make_inline_update(bot, update_id, user_id, query):
+    from telegram import Update
+
+    inline_query = {
+        'id': str(update_id),
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'bench{user_id}'},
+        'query': query,
+        'offset': '',
+    }
+    return Update.de_json({'update_id': update_id, 'inline_query': inline_query}, bot)
+
+
+def make_update(bot, update_id, user_id, text):
+    from telegram import Update
+
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': {'id': user_id, 'is_bot': False, 'first_name': f'bench{user_id}'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return Update.de_json({'update_id': update_id, 'message': message}, bot)
+
+
+def summarize(latencies, wall_time):
+    values = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'count': len(values),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(values.max()), 3),
+        'updates_per_sec': round(len(values) / wall_time, 3),
+    }
+
+
+async def run_load(application, request, workload, concurrency, users, warmup, typing_interval):
+    failed = set()
+
+    async def on_error(update, context):
+        failed.add(update.update_id)
+
+    application.add_error_handler(on_error)
+    update_ids = iter(range(1, 10 ** 9))
+    samples = []
+    # Inline keystrokes: update id -> (query id, sent at); answered later by a background task
+    keystrokes = []
+
+    async def send(command, text, user_id, measure):
+        if command == 'inline':
+            for length in range(1, len(text) + 1):
+                update = make_inline_update(application.bot, next(update_ids), user_id, text[:length])
+                if measure:
+                    keystrokes.append((update.update_id, update.inline_query.id, time.perf_counter()))
+                await application.process_update(update)
+                await asyncio.sleep(typing_interval)
+            return
+        update = make_update(application.bot, next(update_ids), user_id, text)
+        started = time.perf_counter()
+        await application.process_update(update)
+        if measure:
+            samples.append((command, time.perf_counter() - started, update.update_id))
+
+    async def drain():
+        # Non-blocking handlers (inline queries) run as tasks outside process_update; the
+        # application is never start()ed, so these are the only other tasks on the loop
+        pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        if pending:
+            await asyncio.wait(pending, timeout=30)
+
+    for i, (command, text) in enumerate(workload[:warmup]):
+        await send(command, text, users[i % len(users)], measure=False)
+    await drain()
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def feed(i, command, text):
+        async with semaphore:
+            await send(command, text, users[i % len(users)], measure=True)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(feed(i, command, text) for i, (command, text) in enumerate(workload[warmup:], warmup)))
+    await drain()
+    wall_time = time.perf_counter() - started
+
+    debounced = 0
+    for update_id, query_id, sent in keystrokes:
+        answered = request.answered.get(query_id)
+        if answered is None:
+            debounced += 1
+        else:
+            samples.append(('inline', answered - sent, update_id))
+
+    by_command = {}
+    errors = {}
+    for command, latency, update_id in samples:
+        by_command.setdefault(command, []).append(latency)
+        errors[command] = errors.get(command, 0) + (update_id in failed)
+
+    commands = {}
+    for command, latencies in sorted(by_command.items()):
+        commands[command] = summarize(latencies, wall_time)
+        commands[command]['errors'] = errors[command]
+    if 'inline' in commands:
+        commands['inline']['keystrokes'] = len(keystrokes)
+        commands['inline']['debounced'] = debounced
+    total = summarize([latency for _, latency, _ in samples], wall_time)
+    total['errors'] = len(failed & {update_id for _, _, update_id in samples})
+    return {'wall_time_s': round(wall_time, 3), 'total': total, 'commands': commands}
+
+
+def compare(current, baseline, threshold):
+    """Return a description of every metric that regressed by more than threshold."""
+    regressions = []
+    sections = dict(current['commands'], total=current['total'])
+    base_sections = dict(baseline.get('commands', {}), total=baseline.get('total', {}))
+    for name, stats in sections.items():
+        base = base_sections.get(name)
+        if not base:
+            continue
+        for metric, higher_is_worse in REGRESSION_METRICS.items():
+            old, new = base.get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change if higher_is_worse else -change) > threshold:
+                regressions.append(f'{name}.{metric}: {old} -> {new} ({change:+.1%})')
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=300, help='measured updates to send')
+    parser.add_argument('--warmup', type=int, default=20, help='unmeasured updates sent first')
+    parser.add_argument('--concurrency', type=int, default=8, help='updates in flight at once')
+    parser.add_argument('--users', type=int, default=50, help='distinct logged-in users')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='command weights, e.g. coin=3,chat=1')
+    parser.add_argument('--latency', default='',
+                        help='stub latency in seconds per upstream, e.g. yfinance=0.05,llm=0.5 '
+                             f'(upstreams: {", ".join(stubs.LATENCY)})')
+    parser.add_argument('--typing-interval', type=float, default=0.12,
+                        help='seconds between keystrokes of simulated inline queries')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed fractional regression before failing (0.2 = 20%%)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    mix = parse_pairs(args.mix, float)
+    latency = parse_pairs(args.latency, float)
+    output = Path(args.output).resolve()
+    baseline = json.loads(Path(args.baseline).read_text()) if args.baseline else None
+
+    logging.basicConfig(level=logging.WARNING)
+    workload = build_workload(mix, args.updates + args.warmup, args.seed)
+
+    # main.py opens users.db and stocks.csv relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='defisensei-bench-')
+    shutil.copy(REPO_ROOT / 'stocks.csv', workdir)
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.path.insert(0, str(REPO_ROOT))
+    try:
+        stubs.install(latency)
+        import main as bot
+
+        bot.model = bot.train_model(*bot.download_and_preprocess_data('AAPL'))
+        users = list(range(1000, 1000 + args.users))
+        seed_users(users)
+        request = stubs.StubBotRequest()
+        # drain() in run_load() awaits block=False handler tasks itself
+        warnings.filterwarnings('ignore', message='Tasks created via `Application.create_task`')
+        application = bot.build_application(token='0:benchmark', request=request)
+
+        async def run():
+            await application.initialize()
+            try:
+                return await run_load(application, request, workload, args.concurrency, users, args.warmup,
+                                      args.typing_interval)
+            finally:
+                await application.shutdown()
+
+        results = asyncio.run(run())
+    finally:
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results['config'] = {
+        'updates': args.updates,
+        'warmup': args.warmup,
+        'concurrency': args.concurrency,
+        'users': args.users,
+        'typing_interval_s': args.typing_interval,
+        'mix': mix,
+        'latency_s': dict(stubs.LATENCY),
+        'seed': args.seed,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+    }
+    results['upstream_calls'] = dict(stubs.CALLS)
+    results['timestamp'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    output.write_text(json.dumps(results, indent=2))
+
+    print(f"{'command':<20}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'upd/s':>9}{'errors':>8}")
+    for name, stats in list(results['commands'].items()) + [('TOTAL', results['total'])]:
+        print(f"{name:<20}{stats['count']:>7}{stats['p50_ms']:>11.2f}{stats['p95_ms']:>11.2f}"
+              f"{stats['p99_ms']:>11.2f}{stats['updates_per_sec']:>9.2f}{stats['errors']:>8}")
+    print(f'Results written to {output}')
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'Regressions beyond {args.threshold:.0%}:')
+            for line in regressions:
+                print(f'  {line}')
+            return 1
+        print(f'No regressions beyond {args.threshold:.0%} against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
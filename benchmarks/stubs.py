@@ -0,0 +1,313 @@
+"""Deterministic local stand-ins for every upstream the bot talks to.
+
+Call install() *before* importing main: main.py binds CTransformers and the
+URL shortener at import time. Each stand-in sleeps for the latency configured
+for its upstream so the benchmark sees the same blocking behaviour as the
+real network calls, but always returns the same data for the same input.
+"""
+import json
+import smtplib
+import time
+import zlib
+from functools import lru_cache
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import pyshorteners
+import requests
+import yfinance as yf
+from telegram.request import BaseRequest
+
+# Seconds slept per call, keyed by upstream. Overridden by install().
+LATENCY = {
+    'yfinance': 0.05,
+    'requests': 0.08,
+    'smtp': 0.1,
+    'shortener': 0.02,
+    'llm': 1.5,
+}
+
+# Number of calls made to each upstream since install()
+CALLS = {name: 0 for name in LATENCY}
+
+# Fixed "today" so generated histories never depend on the wall clock
+HISTORY_END = pd.Timestamp('2024-06-28')
+HISTORY_DAYS = 2520
+
+PERIOD_DAYS = {
+    '1d': 1, '5d': 5, '1mo': 21, '3mo': 63, '6mo': 126,
+    '1y': 252, '2y': 504, '5y': 1260, '10y': 2520, 'ytd': 124, 'max': HISTORY_DAYS,
+}
+
+COINS = {
+    'bitcoin': ('btc', 'Bitcoin'),
+    'ethereum': ('eth', 'Ethereum'),
+    'tether': ('usdt', 'Tether'),
+    'binancecoin': ('bnb', 'BNB'),
+    'solana': ('sol', 'Solana'),
+    'ripple': ('xrp', 'XRP'),
+    'dogecoin': ('doge', 'Dogecoin'),
+    'cardano': ('ada', 'Cardano'),
+    'polkadot': ('dot', 'Polkadot'),
+    'matic-network': ('matic', 'Polygon'),
+}
+
+USD_INR = 83.2
+
+
+def _pause(upstream):
+    CALLS[upstream] += 1
+    delay = LATENCY.get(upstream, 0)
+    if delay:
+        time.sleep(delay)
+
+
+def _rng(key):
+    return np.random.default_rng(zlib.crc32(key.encode()))
+
+
+@lru_cache(maxsize=None)
+def price_history(symbol):
+    """Full synthetic OHLCV history for a symbol (same symbol -> same frame)."""
+    rng = _rng(symbol.upper())
+    base = 50 + rng.random() * 2950
+    close = base * np.exp(np.cumsum(rng.normal(0.0004, 0.018, HISTORY_DAYS)))
+    open_ = close * (1 + rng.normal(0, 0.006, HISTORY_DAYS))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, HISTORY_DAYS)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, HISTORY_DAYS)))
+    volume = rng.integers(100_000, 5_000_000, HISTORY_DAYS)
+    index = pd.bdate_range(end=HISTORY_END, periods=HISTORY_DAYS, name='Date')
+    return pd.DataFrame({
+        'Open': open_, 'High': high, 'Low': low, 'Close': close,
+        'Adj Close': close, 'Volume': volume,
+    }, index=index)
+
+
+def _slice(frame, period=None, start=None, end=None):
+    if start is not None or end is not None:
+        return frame.loc[start:end].copy()
+    return frame.iloc[-PERIOD_DAYS.get(period or '1mo', 21):].copy()
+
+
+class FakeTicker:
+    """Stand-in for yfinance.Ticker."""
+
+    def __init__(self, symbol, *args, **kwargs):
+        self.ticker = symbol
+
+    def history(self, period='1mo', interval='1d', start=None, end=None, **kwargs):
+        _pause('yfinance')
+        return _slice(price_history(self.ticker), period, start, end).drop(columns=['Adj Close'])
+
+    @property
+    def info(self):
+        _pause('yfinance')
+        history = price_history(self.ticker)
+        last_year = history['Close'].iloc[-252:]
+        rng = _rng('info:' + self.ticker.upper())
+        return {
+            'longName': f'{self.ticker.upper()} Synthetic Ltd',
+            'symbol': self.ticker.upper(),
+            'exchange': 'BSE' if self.ticker.upper().endswith('.BO') else 'NMS',
+            'currentPrice': round(float(history['Close'].iloc[-1]), 2),
+            'marketCap': int(rng.integers(10**9, 10**13)),
+            'trailingPE': round(float(rng.uniform(5, 80)), 2),
+            'fiftyTwoWeekHigh': round(float(last_year.max()), 2),
+            'fiftyTwoWeekLow': round(float(last_year.min()), 2),
+            'dividendYield': round(float(rng.uniform(0, 0.04)), 4),
+        }
+
+
+def fake_download(tickers, start=None, end=None, period=None, **kwargs):
+    """Stand-in for yfinance.download; several tickers give (field, ticker) columns."""
+    _pause('yfinance')
+    symbols = tickers.split() if isinstance(tickers, str) else list(tickers)
+    if len(symbols) == 1:
+        return _slice(price_history(symbols[0]), period, start, end)
+    frames = {symbol: _slice(price_history(symbol), period, start, end) for symbol in symbols}
+    combined = pd.concat(frames, axis=1)
+    return combined.swaplevel(axis=1).sort_index(axis=1)
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+
+def coin_price_inr(coin_id):
+    return round(float(10 ** _rng('coin:' + coin_id).uniform(-1, 6.7)), 2)
+
+
+def _coingecko(path, params):
+    if path.endswith('/simple/price'):
+        ids = [i for i in params.get('ids', '').split(',') if i]
+        currencies = params.get('vs_currencies', 'inr').split(',')
+        data = {}
+        for coin_id in ids:
+            if coin_id not in COINS:
+                continue
+            inr = coin_price_inr(coin_id)
+            quotes = {'inr': inr, 'usd': round(inr / USD_INR, 4)}
+            data[coin_id] = {c: quotes[c] for c in currencies if c in quotes}
+        return FakeResponse(data)
+    if path.endswith('/coins/list'):
+        return FakeResponse([{'id': i, 'symbol': sym, 'name': name} for i, (sym, name) in COINS.items()])
+    if path.endswith('/coins/markets'):
+        ranked = sorted(COINS, key=coin_price_inr, reverse=True)
+        return FakeResponse([{'id': i, 'symbol': COINS[i][0], 'name': COINS[i][1]} for i in ranked])
+    return FakeResponse({'error': 'not found'}, 404)
+
+
+def _alphavantage(params):
+    pair = f"{params.get('from_currency')}/{params.get('to_currency')}"
+    rate = round(float(_rng('fx:' + pair).uniform(0.5, 120)), 4)
+    return FakeResponse({'Realtime Currency Exchange Rate': {'5. Exchange Rate': str(rate)}})
+
+
+def _newsapi():
+    articles = [{
+        'title': f'Synthetic market headline {i}',
+        'description': f'Benchmark article number {i}.',
+        'url': f'https://example.com/news/{i}',
+    } for i in range(5)]
+    return FakeResponse({'status': 'ok', 'articles': articles})
+
+
+def fake_get(url, params=None, **kwargs):
+    """Stand-in for requests.get covering CoinGecko, Alpha Vantage and NewsAPI."""
+    _pause('requests')
+    parsed = urlparse(url)
+    merged = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+    merged.update(params or {})
+    if 'coingecko' in parsed.netloc:
+        return _coingecko(parsed.path, merged)
+    if 'alphavantage' in parsed.netloc:
+        return _alphavantage(merged)
+    if 'newsapi' in parsed.netloc:
+        return _newsapi()
+    return FakeResponse({}, 404)
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP that accepts every message."""
+
+    def __init__(self, host='', port=0, *args, **kwargs):
+        self.sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def starttls(self, *args, **kwargs):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def sendmail(self, from_addr, to_addrs, msg, *args, **kwargs):
+        _pause('smtp')
+        self.sent += 1
+        return {}
+
+    def quit(self):
+        pass
+
+
+class _FakeTinyUrl:
+    def short(self, url):
+        _pause('shortener')
+        return 'https://tinyurl.com/' + format(zlib.crc32(url.encode()), 'x')
+
+
+class FakeShortener:
+    """Stand-in for pyshorteners.Shortener."""
+
+    def __init__(self, *args, **kwargs):
+        self.tinyurl = _FakeTinyUrl()
+
+
+class FakeLLM:
+    """Stand-in for langchain's CTransformers wrapper."""
+
+    def __init__(self, model=None, model_type=None, config=None, **kwargs):
+        self.model = model
+        self.config = dict(config or {})
+
+    def __call__(self, prompt, *args, **kwargs):
+        _pause('llm')
+        return f'[stub llm] {len(prompt)} prompt chars, max_new_tokens={self.config.get("max_new_tokens")}'
+
+
+def install(latency=None):
+    """Patch every upstream with its stand-in; must run before `import main`."""
+    import langchain.llms
+
+    LATENCY.update(latency or {})
+    for name in LATENCY:
+        CALLS[name] = 0
+    yf.Ticker = FakeTicker
+    yf.download = fake_download
+    requests.get = fake_get
+    smtplib.SMTP = FakeSMTP
+    pyshorteners.Shortener = FakeShortener
+    langchain.llms.CTransformers = FakeLLM
+
+
+class StubBotRequest(BaseRequest):
+    """Answers Bot API calls locally instead of talking to api.telegram.org."""
+
+    BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'DeFiSensei', 'username': 'DeFiSenseiBot'}
+
+    def __init__(self):
+        self.calls = {}
+        self.answered = {}  # inline query id -> perf_counter() when it was answered
+        self._message_id = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _message(self, endpoint, params):
+        self._message_id += 1
+        chat_id = params.get('chat_id', 0)
+        message = {
+            'message_id': params.get('message_id', self._message_id),
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': self.BOT_USER,
+        }
+        if 'text' in params:
+            message['text'] = params['text']
+        if endpoint == 'sendPhoto':
+            photo = params.get('photo', '')
+            # Re-sent photos keep their file_id; uploads get a new one
+            reused = isinstance(photo, str) and photo and not photo.startswith('attach://')
+            file_id = photo if reused else f'stub-photo-{self._message_id}'
+            message['photo'] = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 880, 'height': 550}]
+        return message
+
+    def _result(self, endpoint, params):
+        if endpoint == 'getMe':
+            return self.BOT_USER
+        if endpoint.startswith('send') or endpoint.startswith('edit'):
+            return self._message(endpoint, params)
+        return True
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None,
+                         write_timeout=None, connect_timeout=None, pool_timeout=None):
+        endpoint = url.rsplit('/', 1)[-1]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        params = request_data.parameters if request_data is not None else {}
+        if endpoint == 'answerInlineQuery':
+            self.answered[params.get('inline_query_id')] = time.perf_counter()
+        body = {'ok': True, 'result': self._result(endpoint, params)}
+        return 200, json.dumps(body).encode()
@@ -0,0 +1,120 @@
+"""Price/volume chart rendering and caching for /chart.
+
+Charts are drawn with matplotlib's Agg backend in a process pool so a render
+never blocks the event loop. Three caches sit in front of it:
+
+- price history per (symbol, range), kept for history_ttl seconds
+- rendered PNG bytes per (symbol, range, last bar date)
+- the Telegram file_id of every chart already uploaded, so an identical
+  chart is re-sent by id instead of uploading the bytes again
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+RANGES = ('5d', '1mo', '3mo', '6mo', '1y', '2y', '5y', 'max')
+DEFAULT_RANGE = '6mo'
+
+
+def render_png(symbol, label, dates, close, volume):
+    """Draw a close-price line over volume bars and return PNG bytes (runs in a worker)."""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 5), dpi=110)
+    price_axis, volume_axis = figure.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+    price_axis.plot(dates, close, color='#1f77b4', linewidth=1.4)
+    price_axis.fill_between(dates, close, min(close), color='#1f77b4', alpha=0.08)
+    price_axis.set_title(f"{symbol} · {label} · last {close[-1]:,.2f}")
+    price_axis.grid(alpha=0.3)
+    colors = ['#2ca02c' if i == 0 or close[i] >= close[i - 1] else '#d62728' for i in range(len(close))]
+    volume_axis.bar(dates, volume, color=colors, width=0.8)
+    volume_axis.set_ylabel('Volume')
+    volume_axis.grid(alpha=0.3)
+    figure.autofmt_xdate()
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def make_pool(workers):
+    """Worker pool for render_png; create it before the bot starts any threads.
+
+    Fork so workers don't re-import the bot's main module (which loads the LLM),
+    and fork all of them right away: a fork pool starts its workers on the first
+    submit, and forking once threads hold locks can deadlock the children.
+    """
+    if 'fork' in multiprocessing.get_all_start_methods():
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+        pool.submit(int).result()
+        return pool
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+class ChartCache:
+    def __init__(self, max_images=256, history_ttl=300):
+        self.max_images = max_images
+        self.history_ttl = history_ttl
+        self.history = OrderedDict()  # (symbol, range) -> (fetched_at, DataFrame), LRU order
+        self.images = OrderedDict()  # (symbol, range, bar date) -> PNG bytes, LRU order
+        self.file_ids = OrderedDict()  # (symbol, range, bar date) -> Telegram file_id, LRU order
+        self.pending = {}            # charts being rendered right now, shared by concurrent requests
+        self.stats = {'file_id': 0, 'upload': 0, 'rendered': 0}
+
+    def cached_history(self, symbol, period):
+        entry = self.history.get((symbol, period))
+        if entry and time.time() - entry[0] < self.history_ttl:
+            self.history.move_to_end((symbol, period))
+            return entry[1]
+        if entry:
+            del self.history[(symbol, period)]
+        return None
+
+    def store_history(self, symbol, period, frame):
+        # Keyed by whatever symbols users ask for, so bounded like the image caches
+        self._remember(self.history, (symbol, period), (time.time(), frame), self.max_images)
+
+    @staticmethod
+    def key(symbol, period, frame):
+        return symbol, period, frame.index[-1].strftime('%Y-%m-%d')
+
+    def _remember(self, cache, key, value, limit):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def file_id(self, key):
+        return self.file_ids.get(key)
+
+    def store_file_id(self, key, file_id):
+        # file_ids are tiny, so they outlive the PNG bytes by a wide margin
+        self._remember(self.file_ids, key, file_id, self.max_images * 8)
+
+    async def png(self, key, pool, symbol, frame):
+        """PNG bytes for key, rendering in pool at most once even under concurrent requests."""
+        png = self.images.get(key)
+        if png is not None:
+            self.images.move_to_end(key)
+            return png
+        pending = self.pending.get(key)
+        if pending is not None:
+            return await pending
+        label = key[1]
+        pending = asyncio.get_running_loop().run_in_executor(
+            pool, render_png, symbol, label, frame.index.tz_localize(None).to_numpy(),
+            frame['Close'].to_numpy(dtype=float), frame['Volume'].to_numpy(dtype=float))
+        self.pending[key] = pending
+        try:
+            png = await pending
+        finally:
+            self.pending.pop(key, None)
+        self.stats['rendered'] += 1
+        self._remember(self.images, key, png, self.max_images)
+        return png
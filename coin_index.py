@@ -0,0 +1,173 @@
+"""CoinGecko symbol/name/id index and short-lived price cache used by /coin.
+
+The index maps every CoinGecko id, ticker symbol and coin name to an id so
+that "btc", "Bitcoin" and "bitcoin" all resolve to the same coin. It is kept
+in a JSON file and refreshed from /coins/list in the background once it is
+older than refresh_interval. When a ticker is shared by several coins, the
+one with the largest market cap (from /coins/markets) wins.
+
+Prices are fetched for many coins in one /simple/price request and cached per
+coin for price_ttl seconds.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+COINGECKO_API_URL = "https://api.coingecko.com/api/v3"
+VS_CURRENCIES = ('inr', 'usd')
+# CoinGecko rejects very long id lists, so batches are split at this size
+MAX_IDS_PER_REQUEST = 250
+# After a failed refresh (e.g. 429 on the free tier) wait this long, doubling up to the maximum
+RETRY_DELAY = 60
+MAX_RETRY_DELAY = 3600
+COIN_ID_PATTERN = re.compile(r'^[a-z0-9][a-z0-9-]*$')
+
+
+class CoinIndex:
+    def __init__(self, path='coin_index.json', refresh_interval=24 * 3600, price_ttl=60):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.price_ttl = price_ttl
+        self.coins = {}     # id -> {'symbol': ..., 'name': ...}
+        self.lookup = {}    # lower-cased id / symbol / name -> id
+        self.updated_at = 0
+        self.ranked = {}    # id -> market-cap position, for CoinGecko's top coins only
+        self.prices = {}    # id -> (fetched_at, {'inr': ..., 'usd': ...})
+        self.retry_at = 0
+        self._retry_delay = RETRY_DELAY
+        self._refreshing = threading.Lock()
+        self._load()
+
+    # Index
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self._build(data['coins'], data.get('rank', []), data.get('updated_at', 0))
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            logger.error(f"Ignoring unreadable coin index {self.path}: {e}")
+
+    def _build(self, coins, rank, updated_at):
+        position = {coin_id: i for i, coin_id in enumerate(rank)}
+
+        def priority(coin_id):
+            # Market-cap rank first, then the shortest (usually canonical) id
+            return (position.get(coin_id, len(position)), len(coin_id), coin_id)
+
+        lookup = {}
+        for coin_id in sorted(coins, key=priority, reverse=True):
+            info = coins[coin_id]
+            lookup[info['name'].lower()] = coin_id
+            lookup[info['symbol'].lower()] = coin_id
+        for coin_id in coins:
+            lookup[coin_id] = coin_id
+        self.coins, self.lookup, self.updated_at = coins, lookup, updated_at
+        self.ranked = position
+
+    def refresh(self):
+        """Download the coin list (and market-cap ranking) and store it on disk."""
+        response = requests.get(f"{COINGECKO_API_URL}/coins/list", timeout=30)
+        if response.status_code != 200:
+            logger.error(f"Failed to refresh coin index: {response.status_code}")
+            return False
+        coins = {c['id']: {'symbol': c['symbol'], 'name': c['name']} for c in response.json()}
+        rank = []
+        response = requests.get(f"{COINGECKO_API_URL}/coins/markets",
+                                params={'vs_currency': 'usd', 'order': 'market_cap_desc', 'per_page': 250, 'page': 1},
+                                timeout=30)
+        if response.status_code == 200:
+            rank = [c['id'] for c in response.json()]
+        updated_at = time.time()
+        self._build(coins, rank, updated_at)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'updated_at': updated_at, 'rank': rank, 'coins': coins}, f)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Coin index refreshed with {len(coins)} coins")
+        return True
+
+    def _refresh_quietly(self):
+        try:
+            refreshed = self.refresh()
+        except Exception as e:
+            logger.error(f"Unexpected error refreshing coin index: {str(e)}")
+            refreshed = False
+        finally:
+            self._refreshing.release()
+        if refreshed:
+            self.retry_at, self._retry_delay = 0, RETRY_DELAY
+        else:
+            self.retry_at = time.time() + self._retry_delay
+            logger.error(f"Coin index refresh failed, next attempt in {self._retry_delay}s")
+            self._retry_delay = min(self._retry_delay * 2, MAX_RETRY_DELAY)
+
+    def ensure_fresh(self, block=True):
+        """Build the index on first use (in the caller's thread when block is true);
+        afterwards refresh it in the background when stale. Failed refreshes back off."""
+        if self.coins and time.time() - self.updated_at < self.refresh_interval:
+            return
+        if time.time() < self.retry_at or not self._refreshing.acquire(blocking=False):
+            return
+        if self.coins or not block:
+            threading.Thread(target=self._refresh_quietly, name='coin-index-refresh', daemon=True).start()
+        else:
+            self._refresh_quietly()
+
+    def resolve(self, query, fallback=True):
+        """Return the CoinGecko id for an id, ticker or name. Unknown queries are passed
+        through as ids (so /coin bitcoin works without the index) unless fallback is false."""
+        query = query.strip().lower()
+        coin_id = self.lookup.get(query)
+        if coin_id is None and fallback and COIN_ID_PATTERN.match(query):
+            return query
+        return coin_id
+
+    def describe(self, coin_id):
+        info = self.coins.get(coin_id)
+        if not info:
+            return coin_id
+        return f"{info['name']} ({info['symbol'].upper()})"
+
+    # Prices
+
+    def get_prices(self, coin_ids):
+        """Return {id: {'inr': ..., 'usd': ...}}, fetching only ids missing from the cache."""
+        now = time.time()
+        result = {}
+        missing = []
+        for coin_id in dict.fromkeys(coin_ids):
+            cached = self.prices.get(coin_id)
+            if cached and now - cached[0] < self.price_ttl:
+                result[coin_id] = cached[1]
+            else:
+                missing.append(coin_id)
+
+        for start in range(0, len(missing), MAX_IDS_PER_REQUEST):
+            batch = missing[start:start + MAX_IDS_PER_REQUEST]
+            response = requests.get(f"{COINGECKO_API_URL}/simple/price",
+                                    params={'ids': ','.join(batch), 'vs_currencies': ','.join(VS_CURRENCIES)},
+                                    timeout=15)
+            if response.status_code != 200:
+                raise requests.HTTPError(f"CoinGecko returned {response.status_code}")
+            fetched_at = time.time()
+            for coin_id, quote in response.json().items():
+                self.prices[coin_id] = (fetched_at, quote)
+                result[coin_id] = quote
+        return result
+
+    def cached_price(self, coin_id):
+        """Return the cached quote for coin_id if it is still fresh, without any network call."""
+        cached = self.prices.get(coin_id)
+        if cached and time.time() - cached[0] < self.price_ttl:
+            return cached[1]
+        return None
@@ -0,0 +1,115 @@
+"""In-memory suggestions for Telegram inline queries (@DeFiSensei infy).
+
+Inline queries arrive on every keystroke, so InlineSearch answers purely from
+memory: a sorted prefix index over stocks.csv names/symbols and the CoinGecko
+coin index, plus whatever quotes are already cached. It never calls the
+network or SQLite. When the coin index is refreshed the prefix index is
+rebuilt on a background thread and swapped in.
+"""
+import bisect
+import heapq
+import logging
+import threading
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent
+
+logger = logging.getLogger(__name__)
+
+# Coins outside CoinGecko's market-cap ranking sort after every ranked entry
+UNRANKED = 1_000_000
+
+
+class PrefixIndex:
+    def __init__(self, entries):
+        """entries: iterable of (keys, rank, payload); lower rank sorts first."""
+        self.payloads = []
+        pairs = []
+        for keys, rank, payload in entries:
+            ref = len(self.payloads)
+            self.payloads.append((rank, payload))
+            for key in set(keys):
+                pairs.append((key, ref))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.refs = [ref for _, ref in pairs]
+
+    def search(self, prefix, limit):
+        lo = bisect.bisect_left(self.keys, prefix)
+        hi = bisect.bisect_left(self.keys, prefix + '\uffff', lo)
+        exact = {self.refs[i] for i in range(lo, hi) if self.keys[i] == prefix}
+        refs = set(self.refs[lo:hi])
+        best = heapq.nsmallest(limit, refs, key=lambda ref: (ref not in exact, self.payloads[ref][0], ref))
+        return [self.payloads[ref][1] for ref in best]
+
+
+class InlineSearch:
+    def __init__(self, stocks, coin_index=None, stock_quote=None):
+        """stock_quote(symbol) -> (price, label) or None, must not do any I/O."""
+        stocks = stocks.dropna(subset=['name', 'symbol'])
+        self.stocks = [(name.strip(), symbol.strip()) for name, symbol in zip(stocks['name'], stocks['symbol'])]
+        self.coin_index = coin_index
+        self.stock_quote = stock_quote
+        self._coins_version = None
+        self._rebuilding = threading.Lock()
+        self.index = self._build()
+
+    def _build(self):
+        entries = []
+        for position, (name, symbol) in enumerate(self.stocks):
+            keys = [symbol.lower(), symbol.split('.')[0].lower(), name.lower()] + name.lower().split()
+            entries.append((keys, position, ('stock', symbol, name)))
+        if self.coin_index is not None:
+            self._coins_version = self.coin_index.updated_at
+            ranked = self.coin_index.ranked
+            for coin_id, info in self.coin_index.coins.items():
+                keys = [coin_id, info['symbol'].lower(), info['name'].lower()]
+                rank = ranked.get(coin_id, UNRANKED)
+                entries.append((keys, rank, ('coin', coin_id, f"{info['name']} ({info['symbol'].upper()})")))
+        return PrefixIndex(entries)
+
+    def _rebuild(self):
+        try:
+            self.index = self._build()
+            logger.info(f"Inline index rebuilt with {len(self.index.payloads)} entries")
+        finally:
+            self._rebuilding.release()
+
+    def _check_coins(self):
+        if self.coin_index is None or self.coin_index.updated_at == self._coins_version:
+            return
+        if self._rebuilding.acquire(blocking=False):
+            threading.Thread(target=self._rebuild, name='inline-index-rebuild', daemon=True).start()
+
+    def search(self, query, limit=10):
+        """Return (results, has_quotes) for an inline query string."""
+        self._check_coins()
+        prefix = query.strip().lower()
+        if not prefix:
+            return [], False
+        results = []
+        has_quotes = False
+        for kind, key, title in self.index.search(prefix, limit):
+            if kind == 'stock':
+                quote = self.stock_quote(key) if self.stock_quote else None
+                command = f"/stock {key}"
+                if quote:
+                    price, label = quote
+                    description = f"₹{price:,.2f} ({label})"
+                    text = f"{title} ({key}): ₹{price:,.2f} ({label})"
+                else:
+                    description, text = f"Send {command} for the live price", command
+                result_title = f"{key} · {title}"
+            else:
+                quote = self.coin_index.cached_price(key)
+                command = f"/coin {key}"
+                if quote:
+                    description = f"₹{quote.get('inr', 'N/A')} | ${quote.get('usd', 'N/A')}"
+                    text = f"{title}: {description}"
+                else:
+                    description, text = f"Send {command} for the live price", command
+                result_title = title
+            has_quotes = has_quotes or bool(quote)
+            results.append(InlineQueryResultArticle(
+                id=f"{kind}:{key}"[:64], title=result_title, description=description,
+                input_message_content=InputTextMessageContent(text)))
+        return results, has_quotes
@@ -0,0 +1,202 @@
+"""Routes free-text messages that the bot can answer without the LLM.
+
+handle_message() sends every non-command text to the 7B model, which takes
+seconds per reply. Many of those texts are really commands in disguise
+("help", "usd to inr", "price of infy"). IntentRouter recognises them with
+keyword rules, a character n-gram TF-IDF matcher over canned phrases and
+an index of the stocks.csv names and symbols, all built once at start-up.
+Anything it is not confident about returns None and goes to the LLM.
+"""
+import logging
+import re
+from collections import Counter
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+logger = logging.getLogger(__name__)
+
+# Example phrases for intents that take no arguments
+CANNED_INTENTS = {
+    'help': ['help', 'what can you do', 'show commands', 'list of commands', 'how do i use this bot', 'menu'],
+    'budget': ['budget highlights', 'budget 2024', 'union budget', 'india budget highlights',
+               'budget details', 'budget summary'],
+    'market': ['market update', 'market updates', 'how is the market', 'live market', 'market today',
+               'top stocks today', 'market summary'],
+    'news': ['finance news', 'latest news', 'business news', 'market news', 'news today', 'headlines', 'show news'],
+}
+# A canned intent is only considered when the message contains one of its keywords (or is
+# one of its example phrases); checked in this order, so "market news" is news, not market
+CANNED_KEYWORDS = {
+    'help': {'help', 'commands', 'command', 'menu'},
+    'budget': {'budget'},
+    'news': {'news', 'headlines'},
+    'market': {'market', 'markets'},
+}
+
+CURRENCIES = {
+    'USD', 'INR', 'EUR', 'GBP', 'JPY', 'AUD', 'CAD', 'CHF', 'CNY', 'SGD', 'AED', 'HKD',
+    'NZD', 'SEK', 'NOK', 'ZAR', 'RUB', 'BRL', 'KRW', 'SAR', 'THB', 'MYR', 'IDR',
+}
+FOREX_PATTERN = re.compile(r'\b([a-z]{3})\s*(?:/|to|in|-|vs)\s*([a-z]{3})\b')
+
+PRICE_WORDS = {'price', 'prices', 'quote', 'rate', 'value', 'worth', 'trading', 'cost', 'much', 'ltp', 'cmp'}
+INFO_WORDS = {'about', 'info', 'information', 'details', 'detail', 'profile', 'fundamentals', 'pe', 'cap', 'dividend'}
+FILLER_WORDS = {
+    'what', 'whats', 'is', 'the', 'of', 'for', 'a', 'an', 'me', 'tell', 'show', 'give', 'current', 'today',
+    'todays', 'now', 'share', 'shares', 'stock', 'stocks', 'please', 'how', 's', 'on', 'get', 'live', 'latest',
+    'market', 'ratio', 'coin', 'crypto',
+} | PRICE_WORDS | INFO_WORDS
+# Without a price/info keyword these make a message an open question for the LLM ("what is bitcoin")
+QUESTION_WORDS = {'what', 'whats', 'why', 'how', 'who', 'when', 'which', 'should', 'explain', 'is', 'does', 'can'}
+
+# Longer messages are treated as open-ended questions even if they mention a stock
+MAX_STRUCTURED_WORDS = 8
+CANNED_THRESHOLD = 0.7
+FUZZY_NAME_THRESHOLD = 0.55
+# The best fuzzy name must beat the runner-up by this much ("tata" fits several Tata companies)
+FUZZY_NAME_MARGIN = 0.1
+# Words too generic to stand for one company even when only one name starts with them
+GENERIC_NAME_WORDS = {'bank', 'state', 'india', 'indian', 'national', 'power', 'life', 'general', 'united',
+                      'first', 'global', 'capital', 'finance', 'energy', 'motors', 'steel', 'group'}
+
+
+def _words(text):
+    return re.findall(r"[a-z0-9&.\-]+", text.lower())
+
+
+class IntentRouter:
+    def __init__(self, stocks, coin_index=None):
+        """stocks: DataFrame with 'name' and 'symbol' columns (stocks.csv)."""
+        self.coin_index = coin_index
+        self.counts = Counter()
+
+        phrases, self.phrase_intents = [], []
+        for intent, examples in CANNED_INTENTS.items():
+            phrases.extend(examples)
+            self.phrase_intents.extend([intent] * len(examples))
+        self.phrase_intents = np.array(self.phrase_intents)
+        self.canned_phrases = {phrase: intent for intent, examples in CANNED_INTENTS.items() for phrase in examples}
+        self.canned_vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4))
+        self.canned_matrix = self.canned_vectorizer.fit_transform(phrases)
+
+        stocks = stocks.dropna(subset=['name', 'symbol'])
+        self.stock_names = stocks['name'].str.strip().tolist()
+        self.stock_symbols = stocks['symbol'].str.strip().tolist()
+        # Exact aliases: full name, symbol, symbol without exchange suffix, and a first word
+        # that appears in no other name and is not a generic word such as "bank"
+        self.aliases = {}
+        name_words = Counter(word for name in self.stock_names for word in set(name.lower().split()))
+        for name, symbol in zip(self.stock_names, self.stock_symbols):
+            self.aliases[name.lower()] = symbol
+            self.aliases[symbol.lower()] = symbol
+            self.aliases[symbol.split('.')[0].lower()] = symbol
+            first = name.split()[0].lower()
+            if name_words[first] == 1 and len(first) >= 4 and first not in GENERIC_NAME_WORDS:
+                self.aliases[first] = symbol
+        self.name_vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 3))
+        self.name_matrix = self.name_vectorizer.fit_transform([n.lower() for n in self.stock_names])
+
+    # Matching
+
+    def _canned(self, text, words):
+        if text in self.canned_phrases:
+            return self.canned_phrases[text]
+        candidates = [intent for intent, keywords in CANNED_KEYWORDS.items() if keywords & words]
+        if not candidates:
+            return None
+        if len(words) == 1:
+            return candidates[0]
+        scores = (self.canned_matrix @ self.canned_vectorizer.transform([text]).T).toarray().ravel()
+        for intent in candidates:
+            if scores[self.phrase_intents == intent].max() >= CANNED_THRESHOLD:
+                return intent
+        return None
+
+    def _stock_exact(self, words):
+        """Every distinct symbol named in words, longest aliases first."""
+        symbols = []
+        used = [False] * len(words)
+        for size in (3, 2, 1):
+            for i in range(len(words) - size + 1):
+                if any(used[i:i + size]):
+                    continue
+                symbol = self.aliases.get(' '.join(words[i:i + size]))
+                if symbol:
+                    used[i:i + size] = [True] * size
+                    if symbol not in symbols:
+                        symbols.append(symbol)
+        return symbols
+
+    def _stock_fuzzy(self, entity):
+        scores = (self.name_matrix @ self.name_vectorizer.transform([entity]).T).toarray().ravel()
+        if len(scores) < 2:
+            return self.stock_symbols[0] if len(scores) and scores[0] >= FUZZY_NAME_THRESHOLD else None
+        second, best = np.argpartition(scores, -2)[-2:]
+        if scores[best] < FUZZY_NAME_THRESHOLD or scores[best] - scores[second] < FUZZY_NAME_MARGIN:
+            return None
+        return self.stock_symbols[best]
+
+    def _coin(self, words):
+        if self.coin_index is None:
+            return None
+        # Never blocks: on a fresh deploy the index is built in the background
+        self.coin_index.ensure_fresh(block=False)
+        for word in words:
+            coin_id = self.coin_index.resolve(word, fallback=False)
+            # Only well-known coins: CoinGecko has tickers like "the" and "price"
+            if coin_id and coin_id in self.coin_index.ranked:
+                return coin_id
+        return None
+
+    def classify(self, text):
+        """Return (intent, args) for a structured query, or None for the LLM."""
+        lowered = text.lower().strip()
+        words = _words(lowered)
+        if not words or len(words) > MAX_STRUCTURED_WORDS:
+            return None
+
+        match = FOREX_PATTERN.search(lowered)
+        if match and {match.group(1).upper(), match.group(2).upper()} <= CURRENCIES:
+            return 'forex', [match.group(1).upper(), match.group(2).upper()]
+
+        keywords = set(words)
+        intent = self._canned(lowered, keywords)
+        if intent:
+            return intent, []
+
+        entity_words = [w for w in words if w not in FILLER_WORDS]
+        wants_info = bool(keywords & INFO_WORDS)
+        wants_price = bool(keywords & PRICE_WORDS)
+        # A bare name ("infy") counts as a price request; anything else needs a keyword
+        if not (wants_info or wants_price) and (len(words) > 3 or keywords & QUESTION_WORDS):
+            return None
+        if not entity_words:
+            return None
+
+        symbols = self._stock_exact(entity_words)
+        if len(symbols) > 1:
+            # "wipro vs tcs" is a comparison, not a quote request
+            return None
+        symbol = symbols[0] if symbols else None
+        if symbol is None:
+            coin_id = self._coin(entity_words)
+            if coin_id:
+                return 'coin', [coin_id]
+            symbol = self._stock_fuzzy(' '.join(entity_words))
+        if symbol is None:
+            return None
+        if wants_info:
+            name = self.stock_names[self.stock_symbols.index(symbol)]
+            return 'search', name.lower().split()
+        return 'stock', [symbol]
+
+    def route(self, text):
+        """classify() plus bookkeeping of how many messages stay away from the LLM."""
+        result = self.classify(text)
+        self.counts['total'] += 1
+        self.counts[result[0] if result else 'llm'] += 1
+        routed = self.counts['total'] - self.counts['llm']
+        logger.info(f"Intent {result[0] if result else 'llm'}: {routed}/{self.counts['total']} "
+                    f"({routed / self.counts['total']:.1%}) of messages kept away from the LLM")
+        return result
@@ -0,0 +1,208 @@
+"""Self-updating price messages for /live.
+
+Every /live command posts one message (a view) that LiveHub keeps editing
+until it expires. Prices are polled once per distinct symbol, however many
+views contain it, and a price change marks only the views that show that
+symbol as dirty. A single flush loop then edits the dirty views, skipping
+any whose text did not change and pacing edits to stay inside Telegram's
+rate limits. Expired or closed views drop their subscriptions, and a
+symbol's poller is cancelled as soon as no view needs it.
+"""
+import asyncio
+import itertools
+import logging
+import time
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Stored for symbols whose fetch returned no data, so views can say so
+MISSING = ()
+
+
+class LiveView:
+    def __init__(self, view_id, user_id, bot, chat_id, message_id, symbols, expires_at):
+        self.id = view_id
+        self.user_id = user_id
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.symbols = symbols
+        self.until = time.strftime('%H:%M:%S', time.localtime(expires_at))
+        self.text = None
+        self.edited_at = 0.0
+        self.timer = None
+
+
+class LiveHub:
+    def __init__(self, fetch, interval=10, min_edit_interval=3, edits_per_second=25, max_views_per_user=3):
+        """fetch(symbol) -> (price, change %) or None; blocking, so it runs in a thread."""
+        self.fetch = fetch
+        self.interval = interval
+        self.min_edit_interval = min_edit_interval
+        self.edits_per_second = edits_per_second
+        self.max_views_per_user = max_views_per_user
+        self.views = {}        # view id -> LiveView
+        self.subscribers = {}  # symbol -> ids of the views showing it
+        self.pollers = {}      # symbol -> polling task
+        self.quotes = {}       # symbol -> (price, change %, changed at) or MISSING
+        self.dirty = set()     # ids of views whose quotes changed since their last edit
+        self.stats = {'fetches': 0, 'edits': 0, 'skipped': 0}
+        self._ids = itertools.count(1)
+        self._wakeup = None
+        self._flusher = None
+        self._tasks = set()
+
+    # Views
+
+    def open(self, user_id, bot, chat_id, message_id, symbols, duration):
+        """Start updating an already posted message; returns the view."""
+        loop = asyncio.get_running_loop()
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        mine = sorted(view.id for view in self.views.values() if view.user_id == user_id)
+        for view_id in mine[:max(0, len(mine) - self.max_views_per_user + 1)]:
+            self.close(view_id)
+
+        symbols = list(dict.fromkeys(symbols))
+        view = LiveView(next(self._ids), user_id, bot, chat_id, message_id, symbols, time.time() + duration)
+        view.timer = loop.call_later(duration, self.close, view.id)
+        self.views[view.id] = view
+        for symbol in symbols:
+            self.subscribers.setdefault(symbol, set()).add(view.id)
+            if symbol not in self.pollers:
+                self.pollers[symbol] = loop.create_task(self._poll(symbol))
+        # Symbols that are already polled can be shown straight away
+        if any(symbol in self.quotes for symbol in symbols):
+            self._mark({view.id})
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_loop())
+        return view
+
+    def close(self, view_id, notify=True):
+        view = self.views.pop(view_id, None)
+        if view is None:
+            return
+        view.timer.cancel()
+        self.dirty.discard(view_id)
+        final_text = self.render(view, final=True)
+        for symbol in view.symbols:
+            subscribers = self.subscribers.get(symbol)
+            subscribers.discard(view_id)
+            if not subscribers:
+                del self.subscribers[symbol]
+                self.pollers.pop(symbol).cancel()
+                self.quotes.pop(symbol, None)
+        if notify:
+            self._spawn(self._edit(view, final_text, final=True))
+        self._wakeup.set()
+
+    def close_user(self, user_id):
+        """Close every view owned by user_id; returns how many there were."""
+        mine = [view.id for view in self.views.values() if view.user_id == user_id]
+        for view_id in mine:
+            self.close(view_id)
+        return len(mine)
+
+    def stop(self):
+        for view_id in list(self.views):
+            self.close(view_id, notify=False)
+        for task in list(self._tasks) + [self._flusher]:
+            if task is not None:
+                task.cancel()
+
+    # Polling and edits
+
+    def _spawn(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _mark(self, view_ids):
+        self.dirty.update(view_ids)
+        self._wakeup.set()
+
+    async def _poll(self, symbol):
+        while True:
+            self.stats['fetches'] += 1
+            try:
+                quote = await asyncio.to_thread(self.fetch, symbol)
+            except Exception as e:
+                # Keep showing the last known price; the next tick tries again
+                logger.error(f"Live quote for {symbol} failed: {str(e)}")
+                await asyncio.sleep(self.interval)
+                continue
+            previous = self.quotes.get(symbol)
+            if quote is None:
+                quote = MISSING
+            elif previous and previous[:2] == tuple(quote):
+                quote = previous
+            else:
+                quote = (*quote, time.strftime('%H:%M:%S'))
+            if quote != previous:
+                self.quotes[symbol] = quote
+                self._mark(self.subscribers[symbol])
+            await asyncio.sleep(self.interval)
+
+    def render(self, view, final=False):
+        lines = [f"Live prices (ended at {time.strftime('%H:%M:%S')})" if final else f"Live prices until {view.until}"]
+        for symbol in view.symbols:
+            quote = self.quotes.get(symbol)
+            if quote is None:
+                lines.append(f"{symbol}: waiting for data...")
+            elif quote == MISSING:
+                lines.append(f"{symbol}: no price data found")
+            else:
+                price, change, changed_at = quote
+                lines.append(f"{symbol}: ₹{price:,.2f} ({change:+.2f}%) at {changed_at}")
+        return "\n".join(lines)
+
+    async def _edit(self, view, text, final=False, retry=True):
+        if text == view.text:
+            self.stats['skipped'] += 1
+            return
+        try:
+            await view.bot.edit_message_text(text, chat_id=view.chat_id, message_id=view.message_id)
+        except RetryAfter as e:
+            if final:
+                # The view is closed, so nothing else will send its "ended" text: wait and try once more
+                if retry:
+                    await asyncio.sleep(e.retry_after)
+                    await self._edit(view, text, final=True, retry=False)
+            elif view.id in self.views:
+                # Due again once retry_after has passed, and wake the flush loop then
+                view.edited_at = time.monotonic() + e.retry_after - self.min_edit_interval
+                self.dirty.add(view.id)
+                asyncio.get_running_loop().call_later(e.retry_after, self._wakeup.set)
+            return
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                # Message deleted or no longer editable: nobody is looking at this view any more
+                logger.error(f"Closing live view {view.id}: {str(e)}")
+                self.close(view.id, notify=False)
+                return
+        except TelegramError as e:
+            logger.error(f"Failed to edit live view {view.id}: {str(e)}")
+            return
+        view.text = text
+        view.edited_at = time.monotonic()
+        self.stats['edits'] += 1
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while self.views:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            now = time.monotonic()
+            due = [self.views[view_id] for view_id in self.dirty
+                   if view_id in self.views and now - self.views[view_id].edited_at >= self.min_edit_interval]
+            self.dirty.difference_update(view.id for view in due)
+            if self.dirty:
+                # Views edited too recently are retried once their interval has passed
+                loop.call_later(self.min_edit_interval, self._wakeup.set)
+            for start in range(0, len(due), self.edits_per_second):
+                if start:
+                    await asyncio.sleep(1)
+                await asyncio.gather(*(self._edit(view, self.render(view))
+                                       for view in due[start:start + self.edits_per_second] if view.id in self.views))
@@ -0,0 +1,49 @@
+"""CTransformers settings for the chat model, read from the environment (.env).
+
+Unset values keep the library defaults, so an empty .env behaves exactly
+like the original hard-coded setup. benchmarks/llm_tuning.py sweeps these
+settings on the target machine and prints the winning ones as LLM_* lines.
+"""
+import os
+
+DEFAULT_MODEL = 'models/llama-2-7b-chat.ggmlv3.q8_0.bin'
+DEFAULT_MODEL_TYPE = 'llama'
+DEFAULT_CONFIG = {'max_new_tokens': 256, 'temperature': 0.01}
+
+# Environment variable -> (CTransformers config key, type)
+ENV_KEYS = {
+    'LLM_MAX_NEW_TOKENS': ('max_new_tokens', int),
+    'LLM_TEMPERATURE': ('temperature', float),
+    'LLM_THREADS': ('threads', int),
+    'LLM_BATCH_SIZE': ('batch_size', int),
+    'LLM_CONTEXT_LENGTH': ('context_length', int),
+}
+
+PROMPT_TEMPLATE = """
+    Write a response in the style of a {blog_style} for the topic "{input_text}".
+    """
+
+
+def load(environ=None):
+    """Return (model path, model type, config dict) for CTransformers."""
+    environ = os.environ if environ is None else environ
+    model = environ.get('LLM_MODEL', '').strip() or DEFAULT_MODEL
+    model_type = environ.get('LLM_MODEL_TYPE', '').strip() or DEFAULT_MODEL_TYPE
+    config = dict(DEFAULT_CONFIG)
+    for name, (key, cast) in ENV_KEYS.items():
+        value = environ.get(name, '').strip()
+        if value:
+            try:
+                config[key] = cast(value)
+            except ValueError:
+                raise ValueError(f"{name} must be a {cast.__name__}, got {value!r}")
+    return model, model_type, config
+
+
+def to_env(model, config):
+    """.env lines that make load() return this model and config."""
+    lines = [f"LLM_MODEL = {model}"]
+    for name, (key, _) in ENV_KEYS.items():
+        if key in config:
+            lines.append(f"{name} = {config[key]}")
+    return lines
@@ -1,8 +1,11 @@
 import os
+import asyncio
 import logging
+import math
 import requests
 from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes,MessageHandler,ConversationHandler ,filters
+from telegram.error import BadRequest
+from telegram.ext import Application, CommandHandler, ContextTypes,MessageHandler,ConversationHandler ,filters, InlineQueryHandler
 from dotenv import load_dotenv
 import sqlite3
 import hashlib
@@ -17,12 +20,23 @@ import random
 import time
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error
 from langchain.prompts import PromptTemplate
 from langchain.llms import CTransformers
 import logging
+from profiler import HandlerProfiler, MODES as PROFILE_MODES
+from coin_index import CoinIndex
+from portfolio import HistoryCache, PERIODS as PORTFOLIO_PERIODS, risk_metrics, top_correlations
+from intent_router import IntentRouter
+from screener import Screener, ScreenError
+from inline_search import InlineSearch
+from live_quotes import LiveHub
+from llm_config import PROMPT_TEMPLATE as LLM_PROMPT_TEMPLATE, load as load_llm_config
+from charts import ChartCache, DEFAULT_RANGE as DEFAULT_CHART_RANGE, RANGES as CHART_RANGES, make_pool
 
 # Connect to database
 conn = sqlite3.connect('users.db')
@@ -43,6 +57,16 @@ conn.execute('''
 #              ALTER TABLE users ADD COLUMN is_logged_in INTEGER DEFAULT 0
 # ''')
 
+# Portfolio holdings per user
+conn.execute('''
+             CREATE TABLE IF NOT EXISTS portfolio (
+                telegram_id INTEGER NOT NULL,
+                symbol TEXT NOT NULL,
+                quantity REAL NOT NULL,
+                PRIMARY KEY (telegram_id, symbol)
+             )
+''')
+
 conn.commit()
 
 # Hash password
@@ -52,6 +76,8 @@ def hash_password(password):
 # Load token from .env file
 load_dotenv()
 TOKEN = os.getenv("TOKEN")
+# Comma separated Telegram ids allowed to use admin commands such as /profile
+ADMIN_IDS = {int(i) for i in os.getenv("ADMIN_IDS", "").split(",") if i.strip()}
 
 # Configure logging
 logging.basicConfig(
@@ -82,7 +108,7 @@ To interact with AI Finance assistant ChatBot simply type the prompt without any
 
 /start - Welcome message
 /help - List available commands
-/coin <coin name> - Know the current price of a coin. Eg: /price bitcoin
+/coin <coin name or symbol> [more coins...] - Know the current price of one or more coins. Eg: /coin btc eth solana
 /market - Get live market updates including top stocks worldwide, top stocks in India, and forex prices.
 /register <username> <password> <email> - Register a new account
 /login <username> <password> - Login to your account
@@ -96,10 +122,18 @@ To interact with AI Finance assistant ChatBot simply type the prompt without any
 /reset_password <email> <new_password> - Reset your account password
 /predict <stock symbol (i.e., stockname.BO For Indian stock or stocksymbol for global)> - Predict investment return using AI
 /search <stockname> - Search for stocks and financial information Eg: /search infosys
+/portfolio add|remove|show|risk - Manage your holdings and view risk analytics Eg: /portfolio add INFY.BO 10
+/screen <filters> - Screen stocks by technical indicators Eg: /screen rsi<30 close>sma50
+/chart <stock symbol> [range] - Price and volume chart Eg: /chart INFY.BO 1y
+/live <stock symbols> [duration] - Prices that update in place Eg: /live INFY.BO TCS.BO 10m, /live stop to end
         """
     )
 
 
+# Coin index and price cache shared by /coin
+COIN_INDEX = CoinIndex(path=os.getenv("COIN_INDEX_PATH", "coin_index.json"),
+                       price_ttl=int(os.getenv("COIN_PRICE_TTL", "60")))
+
 async def coin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     telegram_id = update.message.from_user.id
     cursor.execute('SELECT is_logged_in FROM users WHERE telegram_id = ?', (telegram_id,))
@@ -107,19 +141,29 @@ async def coin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     
     if result and result[0] == 1:
         if context.args:
-            coin = context.args[0].lower()
-            response = requests.get(f"https://api.coingecko.com/api/v3/simple/price?ids={coin}&vs_currencies=inr")
-            if response.status_code == 200:
-                data = response.json()
-                if coin in data:
-                    price = data[coin]['inr']
-                    await update.message.reply_text(f"The current price of {coin} is ₹{price}")
-                else:
-                    await update.message.reply_text(f"Coin '{coin}' not found.")
-            else:
+            # Accept "/coin btc eth solana" as well as "/coin btc,eth,solana"
+            queries = [q for arg in context.args for q in arg.split(',') if q.strip()]
+            try:
+                # Index build and price requests are blocking HTTP calls: keep them off the event loop
+                await asyncio.to_thread(COIN_INDEX.ensure_fresh)
+                resolved = {q: COIN_INDEX.resolve(q) for q in queries}
+                prices = await asyncio.to_thread(COIN_INDEX.get_prices,
+                                                 [coin_id for coin_id in resolved.values() if coin_id])
+            except Exception as e:
+                logging.error(f"Unexpected error in coin function: {str(e)}")
                 await update.message.reply_text("Failed to fetch price data.")
+                return
+
+            lines = []
+            for query, coin_id in resolved.items():
+                if coin_id in prices:
+                    quote = prices[coin_id]
+                    lines.append(f"{COIN_INDEX.describe(coin_id)}: ₹{quote.get('inr', 'N/A')} | ${quote.get('usd', 'N/A')}")
+                else:
+                    lines.append(f"Coin '{query}' not found.")
+            await update.message.reply_text("\n".join(lines))
         else:
-            await update.message.reply_text("Usage: /coin <coin name>")
+            await update.message.reply_text("Usage: /coin <coin name or symbol> [more coins...]")
     else:
         await update.message.reply_text("You need to be logged in to use this command. Please log in using /login.")
 
@@ -327,6 +371,10 @@ def get_top_stocks_india():
     except Exception as e:
         logging.error(f"Unexpected error in get_top_stocks_india: {str(e)}")
         return []
+# Latest quotes seen by /stock, reused by inline queries
+STOCK_QUOTES = {}
+STOCK_QUOTE_TTL = int(os.getenv("STOCK_QUOTE_TTL", "300"))
+
 # Specific Stock
 async def stock(update: Update, context: ContextTypes.DEFAULT_TYPE):
     telegram_id = update.message.from_user.id
@@ -342,13 +390,14 @@ async def stock(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         try:
             stock = yf.Ticker(symbol)
-            data = stock.history(period="1d")
+            data = await asyncio.to_thread(stock.history, period="1d")
         
             if data.empty:
                 await update.message.reply_text(f"No price data found for {symbol}")
                 return
         
             current_price = data['Close'].iloc[0]
+            STOCK_QUOTES[symbol.upper()] = (time.time(), float(current_price))
             await update.message.reply_text(f"The current price of {symbol} is ₹{current_price}")
 
         except Exception as e:
@@ -407,7 +456,7 @@ async def forex(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     "to_currency": pair_to,
                     "apikey": api_key
                 }
-                response = requests.get(base_url, params=params)
+                response = await asyncio.to_thread(requests.get, base_url, params=params)
                 if response.status_code == 200:
                     data = response.json()
                     if "Realtime Currency Exchange Rate" in data:
@@ -434,9 +483,10 @@ async def market(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
 
         try:
         # Fetch market data
-            stocks_worldwide = get_top_stocks_worldwide()
-            stocks_india = get_top_stocks_india()
-            forex_prices = get_forex_prices()
+            stocks_worldwide, stocks_india, forex_prices = await asyncio.gather(
+                asyncio.to_thread(get_top_stocks_worldwide),
+                asyncio.to_thread(get_top_stocks_india),
+                asyncio.to_thread(get_forex_prices))
 
             if not stocks_worldwide:
                 message += "No data available for top worldwide stocks.\n\n"
@@ -533,7 +583,7 @@ async def finance_news(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             'country': 'in',
             'apiKey': NEWS_API_KEY
         }
-        response = requests.get(NEWS_API_URL, params=params)
+        response = await asyncio.to_thread(requests.get, NEWS_API_URL, params=params)
         data = response.json()
 
         if data.get('status') == 'ok':
@@ -544,7 +594,7 @@ async def finance_news(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
                 for article in articles:
                     title = escape_markdown_v2(article.get('title', 'No Title'))
                     description = escape_markdown_v2(article.get('description', 'No Description'))
-                    url = s.tinyurl.short(article.get('url', 'No URL'))
+                    url = await asyncio.to_thread(s.tinyurl.short, article.get('url', 'No URL'))
                 
                 # Format article with heading, subheading, and body
                     formatted_article = (
@@ -733,7 +783,9 @@ async def reset_password(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 def download_and_preprocess_data(ticker):
     stock_data = yf.download(ticker, start='2020-01-01', end='2023-01-01')
     stock_data.fillna(method='ffill', inplace=True)
-    stock_data['Return'] = stock_data['Close'].pct_change()
+    # Label: the next day's close-to-close return, i.e. what /predict forecasts from today's bar
+    # (the same target backtest.py evaluates)
+    stock_data['Return'] = stock_data['Close'].pct_change().shift(-1)
     stock_data.dropna(inplace=True)
     features = stock_data[['Open', 'High', 'Low', 'Close', 'Volume']].values
     labels = stock_data['Return'].values
@@ -741,7 +793,8 @@ def download_and_preprocess_data(ticker):
 
 # Train model
 def train_model(features, labels):
-    X_train, X_test, y_train, y_test = train_test_split(features, labels, test_size=0.2, random_state=42)
+    # Chronological split: a shuffled split would train on days after the ones it is scored on
+    X_train, X_test, y_train, y_test = train_test_split(features, labels, test_size=0.2, shuffle=False)
     model = LinearRegression()
     model.fit(X_train, y_train)
     predictions = model.predict(X_test)
@@ -766,9 +819,9 @@ async def predict(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
 
     ticker = context.args[0].upper()
-    latest_prices = get_latest_stock_prices(ticker)
+    latest_prices = await asyncio.to_thread(get_latest_stock_prices, ticker)
     predicted_return = predict_return(model, *latest_prices)
-    await update.message.reply_text(f'The predicted return for {ticker} is {predicted_return:.2%}')
+    await update.message.reply_text(f'The predicted next-day return for {ticker} is {predicted_return:.2%}')
 df = pd.read_csv('stocks.csv')
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -798,11 +851,12 @@ def get_stock_details(symbol: str):
 async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if context.args:
         name = ' '.join(context.args).lower()
-        result = df[df['name'].str.lower().str.contains(name)]
+        # Literal match: names such as "Google (Alphabet)" are not valid regular expressions
+        result = df[df['name'].str.lower().str.contains(name, regex=False, na=False)]
         if not result.empty:
             stocks = []
             for _, stock_info in result.iterrows():
-                details = get_stock_details(stock_info['symbol'])
+                details = await asyncio.to_thread(get_stock_details, stock_info['symbol'])
                 stock_details = '\n'.join([f"{key}: {value}" for key, value in details.items()])
                 stocks.append(stock_details)
             message = "\n\n".join(stocks)
@@ -812,29 +866,363 @@ async def search(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message = "Please provide a stock name after the command."
     await update.message.reply_text(message)
 
+# Portfolio
+PORTFOLIO_BENCHMARK = os.getenv("PORTFOLIO_BENCHMARK", "^BSESN")
+PRICE_HISTORY = HistoryCache(ttl=int(os.getenv("PRICE_HISTORY_TTL", "3600")),
+                             max_entries=int(os.getenv("PRICE_HISTORY_MAX", "2048")))
+PORTFOLIO_USAGE = f"""Usage:
+/portfolio add <symbol> <quantity>
+/portfolio remove <symbol> [quantity]
+/portfolio show
+/portfolio risk [period: {', '.join(PORTFOLIO_PERIODS)}]"""
+
+def parse_quantity(text):
+    quantity = float(text)
+    # float() also accepts 'nan' and 'inf'
+    if not (math.isfinite(quantity) and quantity > 0):
+        raise ValueError
+    return quantity
+
+def get_holdings(telegram_id):
+    cursor.execute('SELECT symbol, quantity FROM portfolio WHERE telegram_id = ? ORDER BY symbol', (telegram_id,))
+    return cursor.fetchall()
+
+def format_portfolio_risk(symbols, metrics):
+    lines = [f"Portfolio risk over {metrics['days']} trading days (benchmark {PORTFOLIO_BENCHMARK}):",
+             f"Value: ₹{metrics['value']:,.2f}",
+             f"Annualized volatility: {metrics['portfolio_volatility']:.2%}",
+             f"Beta: {metrics['portfolio_beta']:.2f}",
+             f"1-day VaR ({metrics['confidence']:.0%}) historical: {metrics['historical_var']:.2%} (₹{metrics['historical_var'] * metrics['value']:,.2f})",
+             f"1-day VaR ({metrics['confidence']:.0%}) parametric: {metrics['parametric_var']:.2%} (₹{metrics['parametric_var'] * metrics['value']:,.2f})",
+             "",
+             "Holding: weight | volatility | beta"]
+    for symbol, weight, vol, beta in zip(symbols, metrics['weights'], metrics['volatility'], metrics['betas']):
+        lines.append(f"{symbol}: {weight:.1%} | {vol:.2%} | {beta:.2f}")
+    if len(symbols) > 1:
+        lines.append("")
+        lines.append("Most correlated pairs:")
+        for a, b, rho in top_correlations(symbols, metrics['correlation']):
+            lines.append(f"{a} / {b}: {rho:.2f}")
+    return "\n".join(lines)
+
+async def portfolio(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    telegram_id = update.message.from_user.id
+    if not is_user_logged_in(telegram_id):
+        await update.message.reply_text("You need to be logged in to use this command. Please log in using /login.")
+        return
+    if not context.args:
+        await update.message.reply_text(PORTFOLIO_USAGE)
+        return
 
+    action = context.args[0].lower()
+    args = context.args[1:]
+    try:
+        if action == 'add' and len(args) == 2:
+            symbol, quantity = args[0].upper(), parse_quantity(args[1])
+            # Only accept tickers with price history (this also warms the cache for show/risk)
+            closes = await asyncio.to_thread(PRICE_HISTORY.get, [symbol])
+            if symbol not in closes.columns:
+                await update.message.reply_text(f"No price data found for {symbol}, so it was not added.")
+                return
+            cursor.execute('''INSERT INTO portfolio (telegram_id, symbol, quantity) VALUES (?, ?, ?)
+                              ON CONFLICT(telegram_id, symbol) DO UPDATE SET quantity = quantity + excluded.quantity''',
+                           (telegram_id, symbol, quantity))
+            conn.commit()
+            await update.message.reply_text(f"Added {quantity:g} {symbol} to your portfolio.")
+        elif action == 'remove' and len(args) in (1, 2):
+            symbol = args[0].upper()
+            if len(args) == 2:
+                cursor.execute('UPDATE portfolio SET quantity = quantity - ? WHERE telegram_id = ? AND symbol = ?',
+                               (parse_quantity(args[1]), telegram_id, symbol))
+                cursor.execute('DELETE FROM portfolio WHERE telegram_id = ? AND symbol = ? AND quantity <= 0', (telegram_id, symbol))
+            else:
+                cursor.execute('DELETE FROM portfolio WHERE telegram_id = ? AND symbol = ?', (telegram_id, symbol))
+            conn.commit()
+            await update.message.reply_text(f"Updated {symbol} in your portfolio.")
+        elif action == 'show':
+            holdings = get_holdings(telegram_id)
+            if not holdings:
+                await update.message.reply_text("Your portfolio is empty. Add holdings with /portfolio add <symbol> <quantity>.")
+                return
+            symbols = [symbol for symbol, _ in holdings]
+            closes = await asyncio.to_thread(PRICE_HISTORY.get, symbols)
+            lines = ["Your portfolio:"]
+            total = 0.0
+            for symbol, quantity in holdings:
+                if symbol in closes.columns and not closes.empty:
+                    price = closes[symbol].iloc[-1]
+                    total += price * quantity
+                    lines.append(f"{symbol}: {quantity:g} x ₹{price:,.2f} = ₹{price * quantity:,.2f}")
+                else:
+                    lines.append(f"{symbol}: {quantity:g} (no price data)")
+            lines.append(f"Total: ₹{total:,.2f}")
+            await update.message.reply_text("\n".join(lines))
+        elif action == 'risk' and len(args) <= 1:
+            holdings = get_holdings(telegram_id)
+            if not holdings:
+                await update.message.reply_text("Your portfolio is empty. Add holdings with /portfolio add <symbol> <quantity>.")
+                return
+            period = args[0].lower() if args else '5y'
+            if period not in PORTFOLIO_PERIODS:
+                await update.message.reply_text(PORTFOLIO_USAGE)
+                return
+            quantities = dict(holdings)
+            closes = await asyncio.to_thread(PRICE_HISTORY.get, list(quantities) + [PORTFOLIO_BENCHMARK], period=period)
+            symbols = [s for s in quantities if s in closes.columns]
+            skipped = [s for s in quantities if s not in closes.columns]
+            if PORTFOLIO_BENCHMARK not in closes.columns or not symbols or len(closes) < 3:
+                await update.message.reply_text("Not enough price history to evaluate your portfolio.")
+                return
+            started = time.perf_counter()
+            metrics = risk_metrics(closes[symbols].to_numpy(), np.array([quantities[s] for s in symbols]),
+                                   closes[PORTFOLIO_BENCHMARK].to_numpy())
+            logger.info(f"Portfolio risk for {len(symbols)} holdings x {metrics['days']} days in {(time.perf_counter() - started) * 1000:.1f} ms")
+            report = format_portfolio_risk(symbols, metrics)
+            if skipped:
+                report += f"\n\nSkipped (no price data): {', '.join(skipped)}"
+            await update.message.reply_text(report)
+        else:
+            await update.message.reply_text(PORTFOLIO_USAGE)
+    except ValueError:
+        await update.message.reply_text("Quantity must be a positive number.\n\n" + PORTFOLIO_USAGE)
+    except Exception as e:
+        logger.error(f"Unexpected error in portfolio function: {str(e)}")
+        await update.message.reply_text("An unexpected error occurred. Please try again later.")
+
+# Technical screener over the stocks.csv universe
+SCREENER = Screener(pd.read_csv(os.getenv("SCREEN_UNIVERSE", "stocks.csv")),
+                    path=os.getenv("SCREEN_CACHE_PATH", "screener_cache.npz"),
+                    max_cached_terms=int(os.getenv("SCREEN_CACHED_TERMS", "32")))
+SCREEN_USAGE = """Usage: /screen <filter> [filter ...] [top=N] [sort=<indicator>]
+Eg: /screen rsi<30 close>sma50 top=5
+Filters: rsi<30, close>sma50, ema20>ema50, atr14>5, chg5>3, chg5>-3, 52w_breakout, 52w_breakdown, golden_cross, death_cross
+Indicators: open high low close volume sma<N> ema<N> rsi[N] atr[N] hi<N> lo<N> chg<N>"""
+
+async def screen(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    telegram_id = update.message.from_user.id
+    if not is_user_logged_in(telegram_id):
+        await update.message.reply_text("You need to be logged in to use this command. Please log in using /login.")
+        return
+    if not context.args:
+        await update.message.reply_text(SCREEN_USAGE)
+        return
+
+    filters, top, sort = [], 10, None
+    for arg in context.args:
+        if arg.lower().startswith('top=') and arg[4:].isdigit():
+            top = min(int(arg[4:]), 50)
+        elif arg.lower().startswith('sort='):
+            sort = arg[5:].lower()
+        else:
+            filters.append(arg)
+
+    try:
+        await asyncio.to_thread(SCREENER.refresh)
+        started = time.perf_counter()
+        results, matched = await asyncio.to_thread(SCREENER.screen, filters, top=top, sort=sort)
+        logger.info(f"Screen {filters} over {len(SCREENER.matrix.symbols)} symbols in {(time.perf_counter() - started) * 1000:.1f} ms")
+    except ScreenError as e:
+        await update.message.reply_text(f"{e}\n\n{SCREEN_USAGE}")
+        return
+    except Exception as e:
+        logger.error(f"Unexpected error in screen function: {str(e)}")
+        await update.message.reply_text("An unexpected error occurred. Please try again later.")
+        return
+
+    if not results:
+        await update.message.reply_text("No stocks match those filters.")
+        return
+    lines = [f"{matched} match(es) for {' '.join(filters)}" + (f", showing top {len(results)}:" if matched > len(results) else ":")]
+    for symbol, name, close, values in results:
+        extra = ", ".join(f"{term}={value:.2f}" for term, value in values.items())
+        lines.append(f"{symbol} ({name}): {close:.2f}" + (f" | {extra}" if extra else ""))
+    await update.message.reply_text("\n".join(lines))
+
+# Price charts rendered in a worker pool and re-sent by Telegram file_id
+CHARTS = ChartCache(max_images=int(os.getenv("CHART_CACHE_SIZE", "256")),
+                    history_ttl=int(os.getenv("CHART_HISTORY_TTL", "300")))
+CHART_POOL = None
+
+def get_chart_pool():
+    global CHART_POOL
+    if CHART_POOL is None:
+        CHART_POOL = make_pool(int(os.getenv("CHART_WORKERS", "2")))
+    return CHART_POOL
+
+def stop_chart_pool(pool=None):
+    """Shut down the chart pool (only if it is still pool, when given) so the next chart starts a new one."""
+    global CHART_POOL
+    if CHART_POOL is not None and (pool is None or CHART_POOL is pool):
+        CHART_POOL.shutdown(wait=False, cancel_futures=True)
+        CHART_POOL = None
+
+async def chart(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    telegram_id = update.message.from_user.id
+    if not is_user_logged_in(telegram_id):
+        await update.message.reply_text("You need to be logged in to use this command. Please log in using /login.")
+        return
+    if len(context.args) not in (1, 2) or (len(context.args) == 2 and context.args[1].lower() not in CHART_RANGES):
+        await update.message.reply_text(f"Usage: /chart <stock symbol> [range: {', '.join(CHART_RANGES)}] Eg: /chart INFY.BO 1y")
+        return
+
+    symbol = context.args[0].upper()
+    period = context.args[1].lower() if len(context.args) == 2 else DEFAULT_CHART_RANGE
+    try:
+        frame = CHARTS.cached_history(symbol, period)
+        if frame is None:
+            frame = await asyncio.to_thread(lambda: yf.Ticker(symbol).history(period=period))
+            if frame.empty:
+                await update.message.reply_text(f"No price data found for {symbol}")
+                return
+            CHARTS.store_history(symbol, period, frame)
+        key = CHARTS.key(symbol, period, frame)
+
+        file_id = CHARTS.file_id(key)
+        if file_id:
+            try:
+                await update.message.reply_photo(photo=file_id)
+                CHARTS.stats['file_id'] += 1
+                return
+            except BadRequest:
+                # file_id no longer valid for this bot: upload the bytes again below
+                CHARTS.file_ids.pop(key, None)
+
+        pool = get_chart_pool()
+        try:
+            png = await CHARTS.png(key, pool, symbol, frame)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): replace the whole pool and render once more
+            logger.error("Chart worker pool broke, restarting it")
+            stop_chart_pool(pool)
+            png = await CHARTS.png(key, get_chart_pool(), symbol, frame)
+        message = await update.message.reply_photo(photo=png, filename=f"{symbol}_{period}.png")
+        CHARTS.stats['upload'] += 1
+        if message.photo:
+            CHARTS.store_file_id(key, message.photo[-1].file_id)
+    except Exception as e:
+        logger.error(f"Unexpected error in chart function: {str(e)}")
+        await update.message.reply_text("Failed to render the chart. Please try again later.")
+
+# Inline queries (@DeFiSensei infy): answered from memory only, never the network or SQLite
+# Longer than the gap between keystrokes, so only the query typed last is answered (see Readme for the budget)
+INLINE_DEBOUNCE = float(os.getenv("INLINE_DEBOUNCE", "0.15"))
+INLINE_LATEST = {}
+
+def cached_stock_quote(symbol):
+    quote = STOCK_QUOTES.get(symbol)
+    if quote and time.time() - quote[0] < STOCK_QUOTE_TTL:
+        return quote[1], "live"
+    close = SCREENER.last_close(symbol)
+    if close is not None:
+        return close, "last close"
+    return None
+
+INLINE_SEARCH = InlineSearch(df, COIN_INDEX, stock_quote=cached_stock_quote)
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.inline_query
+    user_id = query.from_user.id
+    # Debounce: while a user is typing only the newest query gets an answer
+    INLINE_LATEST[user_id] = query.id
+    if INLINE_DEBOUNCE:
+        await asyncio.sleep(INLINE_DEBOUNCE)
+        if INLINE_LATEST.get(user_id) != query.id:
+            return
+    INLINE_LATEST.pop(user_id, None)
+
+    results, has_quotes = INLINE_SEARCH.search(query.query)
+    # Quotes go stale quickly; plain symbol suggestions can be cached by Telegram for longer
+    await query.answer(results, cache_time=10 if has_quotes else 300)
+
+
+# Live prices: one message per /live, edited in place while the view lasts
+LIVE_DEFAULT_DURATION = int(os.getenv("LIVE_DEFAULT_DURATION", "300"))
+LIVE_MAX_DURATION = int(os.getenv("LIVE_MAX_DURATION", "3600"))
+LIVE_MAX_SYMBOLS = int(os.getenv("LIVE_MAX_SYMBOLS", "10"))
+LIVE_USAGE = f"""Usage: /live <stock symbol> [more symbols...] [duration] Eg: /live INFY.BO TCS.BO 10m
+Duration is given as 30s, 10m or 1h (default {LIVE_DEFAULT_DURATION // 60}m, at most {LIVE_MAX_DURATION // 60}m).
+/live stop - Stop your live prices"""
+
+def fetch_live_quote(symbol):
+    data = yf.Ticker(symbol).history(period="5d")
+    if data.empty:
+        return None
+    close = data['Close']
+    price = float(close.iloc[-1])
+    previous = float(close.iloc[-2]) if len(close) > 1 else price
+    STOCK_QUOTES[symbol] = (time.time(), price)
+    return price, (price / previous - 1) * 100
+
+LIVE = LiveHub(fetch_live_quote,
+               interval=float(os.getenv("LIVE_POLL_INTERVAL", "10")),
+               min_edit_interval=float(os.getenv("LIVE_MIN_EDIT_INTERVAL", "3")),
+               max_views_per_user=int(os.getenv("LIVE_MAX_VIEWS_PER_USER", "3")))
+
+def parse_duration(text):
+    match = re.fullmatch(r'(\d+)([smh])', text.lower())
+    if not match:
+        return None
+    return int(match.group(1)) * {'s': 1, 'm': 60, 'h': 3600}[match.group(2)]
+
+async def live(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    telegram_id = update.message.from_user.id
+    if not is_user_logged_in(telegram_id):
+        await update.message.reply_text("You need to be logged in to use this command. Please log in using /login.")
+        return
+    args = list(context.args)
+    if args == ['stop']:
+        stopped = LIVE.close_user(telegram_id)
+        await update.message.reply_text(f"Stopped {stopped} live view(s)." if stopped else "You have no live views running.")
+        return
+
+    duration = LIVE_DEFAULT_DURATION
+    if args and parse_duration(args[-1]) is not None:
+        duration = parse_duration(args.pop())
+    symbols = [s.upper() for arg in args for s in arg.split(',') if s.strip()]
+    if not symbols or len(symbols) > LIVE_MAX_SYMBOLS or not 0 < duration <= LIVE_MAX_DURATION:
+        await update.message.reply_text(LIVE_USAGE)
+        return
+
+    message = await update.message.reply_text(f"Starting live prices for {', '.join(symbols)}...")
+    LIVE.open(telegram_id, context.bot, message.chat_id, message.message_id, symbols, duration)
+
+async def stop_workers(application) -> None:
+    LIVE.stop()
+    stop_chart_pool()
 
 
 # Llama Model
-# Initialize the LLaMA 2 model globally
-llm = CTransformers(model='models/llama-2-7b-chat.ggmlv3.q8_0.bin',
-                    model_type='llama',
-                    config={'max_new_tokens': 256,
-                            'temperature': 0.01})
+# Initialize the LLaMA 2 model globally (model file and runtime settings come from LLM_* in .env)
+LLM_MODEL, LLM_MODEL_TYPE, LLM_CONFIG = load_llm_config()
+llm = CTransformers(model=LLM_MODEL,
+                    model_type=LLM_MODEL_TYPE,
+                    config=LLM_CONFIG)
+# The model is not thread-safe, so generations run one at a time on their own thread
+# (which also keeps them from tying up the default pool used by the yfinance calls)
+LLM_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='llm')
 
 # Function to get response from LLaMA 2 model
 def getLLamaresponse(input_text, blog_style='Common People'):
     # Prompt Template
-    template = """
-    Write a response in the style of a {blog_style} for the topic "{input_text}".
-    """
-    
     prompt = PromptTemplate(input_variables=["blog_style", "input_text"],
-                            template=template)
+                            template=LLM_PROMPT_TEMPLATE)
     
     # Generate the response from the LLaMA 2 model
     response = llm(prompt.format(blog_style=blog_style, input_text=input_text))
     return response
+# Intent routing for free-text messages the bot can answer without the LLM
+INTENT_ROUTER = IntentRouter(df, COIN_INDEX)
+INTENT_HANDLERS = {
+    'help': help_command,
+    'budget': budget_highlights,
+    'market': market,
+    'news': finance_news,
+    'forex': forex,
+    'coin': coin,
+    'stock': stock,
+    'search': search,
+}
+
 # Message handler
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_message = update.message.text
@@ -850,8 +1238,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         log = cursor.fetchone()
 
         if log and log[0] == 1:
-            # If logged in, generate a response using the LLaMA model
-            response = getLLamaresponse(user_message)
+            # Structured queries go to the matching command instead of the LLM
+            routed = INTENT_ROUTER.route(user_message)
+            if routed:
+                intent, context.args = routed
+                await INTENT_HANDLERS[intent](update, context)
+                return
+            # If logged in, generate a response using the LLaMA model (off the event loop: it takes seconds)
+            response = await asyncio.get_running_loop().run_in_executor(LLM_EXECUTOR, getLLamaresponse, user_message)
             await update.message.reply_text(response)
         else:
             await update.message.reply_text('Please log in by using /login.')
@@ -863,10 +1257,67 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         # Ensure the database connection is closed
         conn.close()
 
-# Initialize application
-def main():
-    
-    application = Application.builder().token(TOKEN).build()
+# Profiling of live handlers (admin only)
+PROFILER = HandlerProfiler(output_dir=os.getenv("PROFILE_OUTPUT_DIR", "profiles"))
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    if update.message.from_user.id not in ADMIN_IDS:
+        await update.message.reply_text("This command is only available to admins.")
+        return
+
+    usage = ('Usage: /profile start [seconds] [' + '|'.join(PROFILE_MODES) + ' ...] [handler ...] [disk]\n'
+             '/profile stop\n/profile status\n'
+             'Handlers: ' + ', '.join(PROFILER.handler_names()))
+    if not context.args:
+        await update.message.reply_text(usage)
+        return
+
+    action = context.args[0].lower()
+    chat_id = update.message.chat_id
+
+    async def deliver(session, paths, send_files):
+        await context.bot.send_message(chat_id=chat_id, text=f"Profiling finished. Reports written to {session.directory}")
+        if send_files:
+            for path in paths:
+                with open(path, 'rb') as f:
+                    await context.bot.send_document(chat_id=chat_id, document=f, filename=os.path.basename(path))
+
+    if action == 'start':
+        seconds, modes, handlers, send_files = 30, [], [], True
+        for arg in context.args[1:]:
+            if arg.isdigit():
+                seconds = int(arg)
+            elif arg.lower() in PROFILE_MODES:
+                modes.append(arg.lower())
+            elif arg.lower() == 'disk':
+                send_files = False
+            elif arg.lower() != 'all':
+                handlers.append(arg)
+        try:
+            PROFILER.start(modes or ['sample'], handlers, seconds,
+                           on_finish=lambda session, paths: deliver(session, paths, send_files))
+        except (RuntimeError, ValueError) as e:
+            await update.message.reply_text(f"{e}\n\n{usage}")
+            return
+        await update.message.reply_text(PROFILER.status())
+    elif action == 'stop':
+        session, paths = await PROFILER.stop()
+        if session is None:
+            await update.message.reply_text("Profiling is not running.")
+        else:
+            await deliver(session, paths, 'disk' not in [a.lower() for a in context.args[1:]])
+    elif action == 'status':
+        await update.message.reply_text(PROFILER.status())
+    else:
+        await update.message.reply_text(usage)
+
+# Build application with all handlers registered
+def build_application(token=TOKEN, request=None):
+    builder = Application.builder().token(token).post_shutdown(stop_workers)
+    if request is not None:
+        # Custom Bot API transport (e.g. the local stand-in used by benchmarks/)
+        builder = builder.request(request)
+    application = builder.build()
 
     # Add command handlers
     application.add_handler(CommandHandler('start', start))
@@ -887,11 +1338,33 @@ def main():
     application.add_handler(CommandHandler('reset_password', reset_password))
     application.add_handler(CommandHandler('predict', predict))
     application.add_handler(CommandHandler('search', search))
+    application.add_handler(CommandHandler('portfolio', portfolio))
+    application.add_handler(CommandHandler('screen', screen))
+    application.add_handler(CommandHandler('chart', chart))
+    application.add_handler(CommandHandler('live', live))
+    application.add_handler(InlineQueryHandler(inline_query, block=False))
 
      # Message handler for text messages
     message_handler = MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message)
     application.add_handler(message_handler)
 
+    # Make every handler above available to /profile (a single flag check while profiling is off)
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            handler.callback = PROFILER.wrap(handler.callback.__name__, handler.callback)
+    application.add_handler(CommandHandler('profile', profile_command))
+
+    return application
+
+# Initialize application
+def main():
+    
+    application = build_application()
+    # Fork the chart workers now, before the coin index, polling and executor threads exist
+    get_chart_pool()
+    # Build the coin index in the background so routed "btc price" works before anyone runs /coin
+    COIN_INDEX.ensure_fresh(block=False)
+
     # Start the bot
     application.run_polling()
 
@@ -0,0 +1,116 @@
+"""Price-history cache and vectorized risk analytics for /portfolio.
+
+All holdings of a portfolio are fetched with a single yf.download call and
+cached per symbol. Risk metrics are computed on one aligned (days x holdings)
+return matrix with NumPy, so the cost grows with the matrix size rather than
+with a Python loop per holding.
+"""
+import logging
+import time
+from collections import OrderedDict
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+# yfinance history periods accepted by /portfolio risk
+PERIODS = ('1mo', '3mo', '6mo', '1y', '2y', '5y', '10y', 'ytd', 'max')
+
+
+class HistoryCache:
+    """Daily close prices per symbol, refreshed in one batch when older than ttl."""
+
+    def __init__(self, ttl=3600, max_entries=2048):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.closes = OrderedDict()  # (symbol, period) -> (fetched_at, pd.Series), LRU order
+
+    def get(self, symbols, period='5y'):
+        """Return a DataFrame of closes (dates x symbols) aligned on common dates.
+
+        Symbols without any price data are left out of the columns (and not refetched
+        until ttl has passed) so that one bad ticker cannot empty the whole frame.
+        """
+        now = time.time()
+        missing = [s for s in dict.fromkeys(symbols)
+                   if (s, period) not in self.closes or now - self.closes[(s, period)][0] >= self.ttl]
+        if missing:
+            data = yf.download(missing if len(missing) > 1 else missing[0], period=period, progress=False)
+            fetched_at = time.time()
+            close = data['Close'] if not data.empty else pd.DataFrame()
+            if isinstance(close, pd.Series):
+                close = close.to_frame(missing[0])
+            for symbol in missing:
+                series = close[symbol].dropna() if symbol in close.columns else None
+                if series is None or series.empty:
+                    logger.error(f"No price history found for {symbol}")
+                    series = None
+                self.closes[(symbol, period)] = (fetched_at, series)
+        for s in dict.fromkeys(symbols):
+            if (s, period) in self.closes:
+                self.closes.move_to_end((s, period))
+        series = {s: self.closes[(s, period)][1] for s in dict.fromkeys(symbols)
+                  if self.closes.get((s, period), (0, None))[1] is not None}
+        # Keyed by whatever symbols users add, so evict the least recently used
+        while len(self.closes) > self.max_entries:
+            self.closes.popitem(last=False)
+        if not series:
+            return pd.DataFrame()
+        return pd.concat(series, axis=1).sort_index().ffill().dropna(axis=1, how='all').dropna()
+
+
+def risk_metrics(prices, quantities, benchmark, confidence=0.95):
+    """Risk figures for a portfolio.
+
+    prices:     (days x holdings) array of aligned closes
+    quantities: (holdings,) array of units held
+    benchmark:  (days,) array of index closes on the same dates
+    """
+    prices = np.asarray(prices, dtype=float)
+    benchmark = np.asarray(benchmark, dtype=float)
+    returns = prices[1:] / prices[:-1] - 1
+    bench_returns = benchmark[1:] / benchmark[:-1] - 1
+
+    values = prices[-1] * quantities
+    total_value = values.sum()
+    weights = values / total_value
+    portfolio_returns = returns @ weights
+
+    volatility = returns.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+    correlation = np.corrcoef(returns, rowvar=False).reshape(len(weights), len(weights))
+
+    centered = returns - returns.mean(axis=0)
+    bench_centered = bench_returns - bench_returns.mean()
+    bench_var = bench_centered @ bench_centered
+    betas = centered.T @ bench_centered / bench_var
+
+    alpha = 1 - confidence
+    mean, std = portfolio_returns.mean(), portfolio_returns.std(ddof=1)
+    historical_var = -np.quantile(portfolio_returns, alpha)
+    parametric_var = -(mean + NormalDist().inv_cdf(alpha) * std)
+
+    return {
+        'value': total_value,
+        'weights': weights,
+        'volatility': volatility,
+        'portfolio_volatility': std * np.sqrt(TRADING_DAYS),
+        'correlation': correlation,
+        'betas': betas,
+        'portfolio_beta': float(weights @ betas),
+        'historical_var': historical_var,
+        'parametric_var': parametric_var,
+        'confidence': confidence,
+        'days': len(returns),
+    }
+
+
+def top_correlations(symbols, correlation, count=5):
+    """Most correlated distinct pairs as (symbol_a, symbol_b, rho)."""
+    rows, cols = np.triu_indices(len(symbols), k=1)
+    values = correlation[rows, cols]
+    order = np.argsort(values)[::-1][:count]
+    return [(symbols[rows[i]], symbols[cols[i]], values[i]) for i in order]
@@ -0,0 +1,272 @@
+"""On-demand profiling of live handlers.
+
+Every handler registered in build_application() is wrapped by
+HandlerProfiler.wrap(). While no session is running the wrapper only checks
+one boolean before calling straight through, so leaving it installed in
+production costs next to nothing. An admin starts a time-boxed session with
+/profile; when it ends the results are written to disk (and optionally sent
+back to the admin chat):
+
+- sample:      a background thread samples the event-loop thread's stack and
+               writes folded stacks (flamegraph.pl / speedscope compatible)
+- cprofile:    cProfile enabled on the event-loop thread while at least one
+               selected handler is in progress, as a .prof file plus a text
+               report sorted by cumulative time. Handlers suspend at every
+               await, so other coroutines that run in the meantime (including
+               unselected handlers) are profiled too; work handed to threads
+               with asyncio.to_thread is not.
+- tracemalloc: allocations still live at the end of the session whose stack
+               passes through a selected handler, by line and as size-weighted
+               folded stacks. Allocations made in worker threads, or deeper
+               than the 25 traced frames, are not attributed to a handler.
+"""
+import asyncio
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+MODES = ('sample', 'cprofile', 'tracemalloc')
+MAX_SECONDS = 600
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _code_lines(code):
+    """Every source line of a function, including nested functions and lambdas."""
+    lines = {line for _, _, line in code.co_lines() if line is not None}
+    for const in code.co_consts:
+        if hasattr(const, 'co_lines'):
+            lines |= _code_lines(const)
+    return lines
+
+
+class ProfileSession:
+    def __init__(self, modes, handlers, seconds, interval, output_dir):
+        self.modes = set(modes)
+        self.handlers = set(handlers)  # empty set means every handler
+        self.seconds = seconds
+        self.interval = interval
+        self.started = time.time()
+        self.directory = os.path.join(output_dir, time.strftime('profile-%Y%m%d-%H%M%S'))
+        self.stacks = Counter()
+        self.samples = 0
+        self.calls = Counter()
+        self.profile = cProfile.Profile() if 'cprofile' in self.modes else None
+        self.profile_depth = 0
+        self.target_codes = {}
+        self.started_tracing = False
+        self.loop_thread_id = None
+        self.stop_event = threading.Event()
+        self.sampler = None
+
+    def includes(self, name):
+        return not self.handlers or name in self.handlers
+
+
+class HandlerProfiler:
+    def __init__(self, output_dir='profiles', interval=0.005):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.active = False
+        self.session = None
+        self.callbacks = {}
+        self._timer = None
+
+    # Installation
+
+    def wrap(self, name, callback):
+        """Return callback wrapped so it can be profiled by name."""
+        self.callbacks[name] = callback
+
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            if not self.active:
+                return await callback(update, context)
+            return await self._profiled_call(name, callback, update, context)
+
+        return wrapper
+
+    def handler_names(self):
+        return sorted(self.callbacks)
+
+    # Session control
+
+    def start(self, modes=('sample',), handlers=(), seconds=30, on_finish=None):
+        """Start a time-boxed session; on_finish(session, paths) is awaited when it ends."""
+        if self.active:
+            raise RuntimeError('A profiling session is already running.')
+        unknown = set(handlers) - set(self.callbacks)
+        if unknown:
+            raise ValueError(f"Unknown handler(s): {', '.join(sorted(unknown))}")
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise ValueError(f"Unknown mode(s): {', '.join(sorted(unknown))}")
+        seconds = max(1, min(int(seconds), MAX_SECONDS))
+
+        session = ProfileSession(modes, handlers, seconds, self.interval, self.output_dir)
+        session.target_codes = {
+            callback.__code__: name for name, callback in self.callbacks.items()
+            if session.includes(name) and hasattr(callback, '__code__')
+        }
+        session.loop_thread_id = threading.get_ident()
+        if 'tracemalloc' in session.modes and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            session.started_tracing = True
+        if 'sample' in session.modes:
+            session.sampler = threading.Thread(target=self._sample_loop, args=(session,),
+                                               name='handler-sampler', daemon=True)
+            session.sampler.start()
+        self.session = session
+        self.active = True
+        self._timer = asyncio.get_running_loop().create_task(self._stop_later(seconds, on_finish))
+        logger.info(f"Profiling started: modes={sorted(session.modes)} handlers={sorted(session.handlers) or 'all'} for {seconds}s")
+        return session
+
+    async def stop(self):
+        """Stop the running session and write its reports; returns (session, paths)."""
+        session = self.session
+        if not self.active or session is None:
+            return None, []
+        self.active = False
+        self.session = None
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        session.stop_event.set()
+        if session.sampler is not None:
+            session.sampler.join()
+        if session.profile is not None and session.profile_depth:
+            session.profile.disable()
+        snapshot = None
+        if 'tracemalloc' in session.modes:
+            snapshot = tracemalloc.take_snapshot()
+            # Leave tracing on if something else had already started it
+            if session.started_tracing:
+                tracemalloc.stop()
+        paths = await asyncio.to_thread(self._write_reports, session, snapshot)
+        logger.info(f"Profiling finished after {time.time() - session.started:.1f}s, wrote {len(paths)} file(s)")
+        return session, paths
+
+    def status(self):
+        session = self.session
+        if not self.active or session is None:
+            return 'Profiling is off.'
+        remaining = session.seconds - (time.time() - session.started)
+        calls = ', '.join(f'{name}={count}' for name, count in session.calls.most_common()) or 'none yet'
+        return (f"Profiling {', '.join(sorted(session.modes))} on {', '.join(sorted(session.handlers)) or 'all handlers'}; "
+                f"{max(remaining, 0):.0f}s left; calls: {calls}; samples: {session.samples}")
+
+    async def _stop_later(self, seconds, on_finish):
+        await asyncio.sleep(seconds)
+        session, paths = await self.stop()
+        if session is not None and on_finish is not None:
+            await on_finish(session, paths)
+
+    # Collection
+
+    async def _profiled_call(self, name, callback, update, context):
+        session = self.session
+        if session is None or not session.includes(name):
+            return await callback(update, context)
+        session.calls[name] += 1
+        profile = session.profile
+        if profile is None:
+            return await callback(update, context)
+        if session.profile_depth == 0:
+            profile.enable()
+        session.profile_depth += 1
+        try:
+            return await callback(update, context)
+        finally:
+            session.profile_depth -= 1
+            if session.profile_depth == 0 and self.session is session:
+                profile.disable()
+
+    def _sample_loop(self, session):
+        while not session.stop_event.wait(session.interval):
+            frame = sys._current_frames().get(session.loop_thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                handler = session.target_codes.get(frame.f_code)
+                if handler is not None:
+                    stack[-1] = handler
+                    session.stacks[';'.join(reversed(stack))] += 1
+                    session.samples += 1
+                    break
+                frame = frame.f_back
+            del frame
+
+    # Reports
+
+    def _write_reports(self, session, snapshot):
+        os.makedirs(session.directory, exist_ok=True)
+        paths = []
+
+        if 'sample' in session.modes:
+            path = os.path.join(session.directory, 'samples.folded')
+            with open(path, 'w') as f:
+                for stack, count in session.stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            paths.append(path)
+
+        if session.profile is not None:
+            path = os.path.join(session.directory, 'handlers.prof')
+            session.profile.dump_stats(path)
+            paths.append(path)
+            report = io.StringIO()
+            try:
+                pstats.Stats(session.profile, stream=report).sort_stats('cumulative').print_stats(40)
+            except TypeError:
+                report.write('No handler calls were profiled.\n')
+            path = os.path.join(session.directory, 'cprofile.txt')
+            with open(path, 'w') as f:
+                f.write(report.getvalue())
+            paths.append(path)
+
+        if snapshot is not None:
+            # Inclusive filters are OR-ed: keep traces with any frame inside a selected handler
+            handler_lines = [tracemalloc.Filter(True, code.co_filename, lineno, all_frames=True)
+                             for code in session.target_codes for lineno in _code_lines(code)]
+            snapshot = snapshot.filter_traces(handler_lines + [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            ])
+            path = os.path.join(session.directory, 'allocations.txt')
+            with open(path, 'w') as f:
+                stats = snapshot.statistics('lineno')
+                f.write(f'Top allocations by line ({sum(s.size for s in stats) / 1024:.1f} KiB live):\n\n')
+                for index, stat in enumerate(stats[:30], 1):
+                    frame = stat.traceback[0]
+                    f.write(f'#{index}: {frame.filename}:{frame.lineno}: {stat.size / 1024:.1f} KiB in {stat.count} blocks\n')
+            paths.append(path)
+            path = os.path.join(session.directory, 'allocations.folded')
+            with open(path, 'w') as f:
+                for stat in snapshot.statistics('traceback'):
+                    frames = [f'{os.path.basename(fr.filename)}:{fr.lineno}' for fr in stat.traceback]
+                    f.write(f"{';'.join(frames)} {stat.size}\n")
+            paths.append(path)
+
+        summary = os.path.join(session.directory, 'summary.txt')
+        with open(summary, 'w') as f:
+            f.write(f"modes: {', '.join(sorted(session.modes))}\n")
+            f.write(f"handlers: {', '.join(sorted(session.handlers)) or 'all'}\n")
+            f.write(f'duration: {time.time() - session.started:.1f}s (limit {session.seconds}s)\n')
+            f.write(f'samples: {session.samples} every {session.interval * 1000:.0f} ms\n')
+            for name, count in session.calls.most_common():
+                f.write(f'calls {name}: {count}\n')
+        paths.insert(0, summary)
+        return paths
@@ -0,0 +1,307 @@
+"""Technical-indicator screener over a (symbols x days) price matrix.
+
+PriceMatrix downloads the whole universe in one batch, then appends only
+the new trading days once per day and keeps a copy on disk so a restart does
+not refetch history. Indicators are computed for every symbol at once along
+the day axis and memoised until the next refresh, so after the first screen
+of the day a filter is a handful of vector comparisons.
+
+Filter syntax (all filters must match):
+    rsi<30   chg5>-3   close>sma50   ema20>=ema50   atr14>5   volume>1000000
+    52w_breakout   52w_breakdown   golden_cross   death_cross
+Terms: open high low close volume, sma<N> ema<N> rsi[N] atr[N],
+hi<N>/lo<N> (N-day high/low), chg<N> (% change over N days).
+"""
+import datetime
+import logging
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+# Enough trading days for a 52-week window plus sma200 warm-up
+MAX_DAYS = 400
+INITIAL_PERIOD = '2y'
+# Each memoised term is a full (symbols x MAX_DAYS) array, so only this many are kept
+MAX_CACHED_TERMS = 32
+
+TERM_PATTERN = re.compile(r'^(open|high|low|close|volume|sma|ema|rsi|atr|hi|lo|chg)(\d*)$')
+FILTER_PATTERN = re.compile(r'^(-?[a-z0-9.]+)\s*(<=|>=|<|>)\s*(-?[a-z0-9.]+)$')
+DEFAULT_PERIODS = {'rsi': 14, 'atr': 14, 'chg': 1, 'hi': 252, 'lo': 252}
+NAMED_FILTERS = ('52w_breakout', '52w_breakdown', 'golden_cross', 'death_cross')
+
+
+class ScreenError(ValueError):
+    pass
+
+
+def ffill(values):
+    """Forward-fill NaNs along the day axis of a 2-D array."""
+    index = np.where(np.isnan(values), 0, np.arange(values.shape[1]))
+    np.maximum.accumulate(index, axis=1, out=index)
+    return values[np.arange(values.shape[0])[:, None], index]
+
+
+def sma(values, n):
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0), axis=1)
+    counts = np.cumsum(valid, axis=1)
+    sums[:, n:] = sums[:, n:] - sums[:, :-n]
+    counts[:, n:] = counts[:, n:] - counts[:, :-n]
+    return np.where(counts == n, sums / n, np.nan)
+
+
+def smooth(values, alpha):
+    """Exponential smoothing of every row at once (one vector step per day)."""
+    out = np.empty_like(values)
+    current = values[:, 0].copy()
+    out[:, 0] = current
+    for day in range(1, values.shape[1]):
+        column = values[:, day]
+        current = np.where(np.isnan(current), column, current + alpha * (column - current))
+        out[:, day] = current
+    return out
+
+
+def ema(values, n):
+    return smooth(values, 2 / (n + 1))
+
+
+def rsi(close, n):
+    delta = np.diff(close, axis=1, prepend=np.nan)
+    gain = smooth(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), 1 / n)
+    loss = smooth(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), 1 / n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+
+
+def atr(high, low, close, n):
+    previous = np.concatenate([np.full((close.shape[0], 1), np.nan), close[:, :-1]], axis=1)
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous), np.abs(low - previous)))
+    return smooth(true_range, 1 / n)
+
+
+def rolling(values, n, reducer):
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= n:
+        out[:, n - 1:] = reducer(np.lib.stride_tricks.sliding_window_view(values, n, axis=1), axis=-1)
+    return out
+
+
+class PriceMatrix:
+    def __init__(self, symbols, path=None):
+        self.symbols = list(symbols)
+        self.path = path
+        self.dates = pd.DatetimeIndex([])
+        self.data = {field: np.empty((len(self.symbols), 0)) for field in FIELDS}
+        self.refreshed_on = None
+        self.version = 0
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            stored = np.load(self.path, allow_pickle=False)
+        except (FileNotFoundError, OSError, ValueError):
+            return
+        if list(stored['symbols']) != self.symbols:
+            return
+        self.dates = pd.DatetimeIndex(stored['dates'])
+        self.data = {field: stored[field] for field in FIELDS}
+        self.refreshed_on = datetime.date.fromisoformat(str(stored['refreshed_on']))
+        self.version += 1
+
+    def _save(self):
+        if not self.path:
+            return
+        with open(self.path, 'wb') as f:
+            np.savez(f, symbols=np.array(self.symbols), dates=self.dates.to_numpy(),
+                     refreshed_on=np.array(self.refreshed_on.isoformat()), **self.data)
+
+    def refresh(self, today=None):
+        """Fetch new trading days for the whole universe; at most once per day."""
+        today = today or datetime.date.today()
+        if self.refreshed_on == today and len(self.dates):
+            return False
+        if len(self.dates):
+            frame = yf.download(self.symbols, start=self.dates[-1].strftime('%Y-%m-%d'), progress=False)
+        else:
+            frame = yf.download(self.symbols, period=INITIAL_PERIOD, progress=False)
+        if frame.empty:
+            logger.error("Screener refresh returned no data")
+            return False
+
+        new_dates = pd.DatetimeIndex(frame.index).tz_localize(None).normalize()
+        # The last stored day may have been partial, so it is replaced rather than kept
+        keep = self.dates < new_dates[0] if len(self.dates) else np.zeros(0, dtype=bool)
+        data = {}
+        for field in FIELDS:
+            block = frame[field] if isinstance(frame[field], pd.DataFrame) else frame[field].to_frame(self.symbols[0])
+            fresh = block.reindex(columns=self.symbols).to_numpy(dtype=float).T
+            data[field] = np.concatenate([self.data[field][:, keep], fresh], axis=1)[:, -MAX_DAYS:]
+        # Swapped in together: readers on the event loop never see dates and data out of step
+        self.dates, self.data = self.dates[keep].append(new_dates)[-MAX_DAYS:], data
+        self.refreshed_on = today
+        self.version += 1
+        self._save()
+        logger.info(f"Screener matrix refreshed: {len(self.symbols)} symbols x {len(self.dates)} days")
+        return True
+
+
+class Screener:
+    def __init__(self, stocks, path=None, max_cached_terms=MAX_CACHED_TERMS):
+        stocks = stocks.dropna(subset=['symbol'])
+        stocks = stocks.assign(symbol=stocks['symbol'].str.strip()).drop_duplicates('symbol')
+        self.names = dict(zip(stocks['symbol'], stocks['name']))
+        self.matrix = PriceMatrix(stocks['symbol'], path)
+        self.max_cached_terms = max_cached_terms
+        self._cache = OrderedDict()  # term -> (symbols x days) array, LRU order
+        self._cache_version = None
+        self._positions = {}
+        self._positions_version = None
+        # Held by refresh() and screen(), which run in worker threads, so a screen never
+        # sees a half-refreshed matrix and the term memo is never updated concurrently
+        self._lock = threading.RLock()
+
+    def refresh(self):
+        """Blocking download; concurrent callers wait for the one in progress."""
+        with self._lock:
+            return self.matrix.refresh()
+
+    def last_close(self, symbol):
+        """Latest stored close for symbol (no I/O, no lock), or None."""
+        data, symbols = self.matrix.data, self.matrix.symbols
+        if self._positions_version != self.matrix.version:
+            self._positions = {s: i for i, s in enumerate(symbols)}
+            self._positions_version = self.matrix.version
+        position = self._positions.get(symbol)
+        if position is None or not data['Close'].shape[1]:
+            return None
+        # Read the raw row rather than the memo, which a screen may be updating in a thread
+        closes = data['Close'][position]
+        closes = closes[~np.isnan(closes)]
+        return float(closes[-1]) if len(closes) else None
+
+    def _field(self, name):
+        return ffill(self.matrix.data[name.capitalize()])
+
+    def term(self, term):
+        """Full (symbols x days) series for a term such as 'sma50' or 'rsi'."""
+        if self._cache_version != self.matrix.version:
+            self._cache = OrderedDict()
+            self._cache_version = self.matrix.version
+        if term in self._cache:
+            self._cache.move_to_end(term)
+            return self._cache[term]
+        match = TERM_PATTERN.match(term)
+        if not match:
+            raise ScreenError(f"Unknown indicator '{term}'")
+        kind, digits = match.groups()
+        n = int(digits) if digits else DEFAULT_PERIODS.get(kind)
+        if kind in ('open', 'high', 'low', 'close', 'volume'):
+            if digits:
+                raise ScreenError(f"'{kind}' takes no period")
+            values = self._field(kind)
+        elif n is None or n < 1:
+            raise ScreenError(f"'{kind}' needs a period, e.g. {kind}50")
+        elif n > MAX_DAYS:
+            raise ScreenError(f"'{term}': periods go up to {MAX_DAYS} days")
+        elif kind == 'sma':
+            values = sma(self.term('close'), n)
+        elif kind == 'ema':
+            values = ema(self.term('close'), n)
+        elif kind == 'rsi':
+            values = rsi(self.term('close'), n)
+        elif kind == 'atr':
+            values = atr(self.term('high'), self.term('low'), self.term('close'), n)
+        elif kind == 'hi':
+            values = rolling(self.term('high'), n, np.max)
+        elif kind == 'lo':
+            values = rolling(self.term('low'), n, np.min)
+        else:  # chg
+            close = self.term('close')
+            values = np.full(close.shape, np.nan)
+            values[:, n:] = (close[:, n:] / close[:, :-n] - 1) * 100
+        self._cache[term] = values
+        while len(self._cache) > self.max_cached_terms:
+            self._cache.popitem(last=False)
+        return values
+
+    def _operand(self, text):
+        try:
+            return float(text)
+        except ValueError:
+            return self.term(text)[:, -1]
+
+    def _named(self, name):
+        if name in ('52w_breakout', '52w_breakdown'):
+            close = self.term('close')[:, -1]
+            if name == '52w_breakout':
+                return close > self.term('hi252')[:, -2]
+            return close < self.term('lo252')[:, -2]
+        fast, slow = self.term('sma50'), self.term('sma200')
+        spread_now, spread_before = fast[:, -1] - slow[:, -1], fast[:, -2] - slow[:, -2]
+        if name == 'golden_cross':
+            return (spread_now > 0) & (spread_before <= 0)
+        return (spread_now < 0) & (spread_before >= 0)
+
+    def screen(self, filters, top=10, sort=None):
+        """Symbols matching every filter as [(symbol, name, close, {term: value})].
+
+        Blocking (the first screen after a refresh recomputes its indicators), so run it in a thread.
+        """
+        with self._lock:
+            return self._screen(filters, top, sort)
+
+    def _screen(self, filters, top, sort):
+        if not len(self.matrix.dates):
+            raise ScreenError('No price data available yet.')
+        if len(self.matrix.dates) < 2:
+            raise ScreenError('Not enough price history to screen.')
+        mask = np.ones(len(self.matrix.symbols), dtype=bool)
+        shown = []
+        sort_values, descending = None, True
+        for raw in filters:
+            text = raw.lower().replace(' ', '')
+            if text in NAMED_FILTERS:
+                mask &= self._named(text)
+                continue
+            match = FILTER_PATTERN.match(text)
+            if not match:
+                raise ScreenError(f"Can't understand filter '{raw}'")
+            left, op, right = match.groups()
+            lhs, rhs = self._operand(left), self._operand(right)
+            with np.errstate(invalid='ignore'):
+                mask &= {'<': lhs < rhs, '<=': lhs <= rhs, '>': lhs > rhs, '>=': lhs >= rhs}[op]
+            for side in (left, right):
+                if TERM_PATTERN.match(side) and side not in shown:
+                    shown.append(side)
+            if sort_values is None:
+                # Most extreme first: furthest below for "<" filters, furthest above for ">"
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    margin = np.where(rhs != 0, (lhs - rhs) / np.abs(rhs), lhs - rhs)
+                sort_values, descending = np.broadcast_to(margin, mask.shape), op.startswith('>')
+        if sort:
+            sort_values, descending = self._operand(sort), True
+            if sort not in shown and sort != 'close':
+                shown.append(sort)
+        if sort_values is None:
+            sort_values = self.term('chg1')[:, -1]
+
+        matches = np.flatnonzero(mask)
+        keys = np.nan_to_num(sort_values[matches], nan=-np.inf if descending else np.inf)
+        order = matches[np.argsort(-keys if descending else keys, kind='stable')][:top]
+        close = self.term('close')[:, -1]
+        results = []
+        for i in order:
+            symbol = self.matrix.symbols[i]
+            values = {term: float(self.term(term)[i, -1]) for term in shown if term != 'close'}
+            results.append((symbol, self.names.get(symbol, symbol), float(close[i]), values))
+        return results, int(mask.sum())
@@ -0,0 +1,75 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from coin_index import CoinIndex
+from intent_router import IntentRouter
+
+STOCKS = Path(__file__).resolve().parent.parent / 'stocks.csv'
+
+
+@pytest.fixture(scope='module')
+def router(tmp_path_factory):
+    coins = CoinIndex(path=str(tmp_path_factory.mktemp('coins') / 'coin_index.json'))
+    coins._build({'bitcoin': {'symbol': 'btc', 'name': 'Bitcoin'},
+                  'ethereum': {'symbol': 'eth', 'name': 'Ethereum'}},
+                 ['bitcoin', 'ethereum'], updated_at=float('inf'))
+    return IntentRouter(pd.read_csv(STOCKS), coins)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('help', ('help', [])),
+    ('what can you do', ('help', [])),
+    ('budget', ('budget', [])),
+    ('budget highlights', ('budget', [])),
+    ('market update', ('market', [])),
+    ('how is the market', ('market', [])),
+    ('market news today', ('news', [])),
+    ('latest news', ('news', [])),
+    ('usd to inr', ('forex', ['USD', 'INR'])),
+    ('price of infy', ('stock', ['INFY.BO'])),
+    ('infy', ('stock', ['INFY.BO'])),
+    ('btc price', ('coin', ['bitcoin'])),
+    ('tata motors price', ('stock', ['TATAMOTORS.BO'])),
+    ('icici bank', ('stock', ['ICICIBANK.BO'])),
+    ('tell me about infosys', ('search', ['infosys'])),
+    ('tell me about google', ('search', ['google', '(alphabet)'])),
+    ('info on meta', ('search', ['meta', '(facebook)'])),
+])
+def test_routed(router, text, expected):
+    assert router.classify(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    'what is bitcoin',
+    'what is the nifty',
+    'what is in the bond market',
+    'what is in the portfolio',
+    'what is a budgie',
+    'what is in the budget',
+    'why did the market fall',
+    'explain the budget deficit',
+    'What is an index fund?',
+    'Explain SIP vs lump sum investing',
+    'bank',
+    'bank nifty',
+    'adani',
+    'tata',
+    'wipro vs tcs',
+])
+def test_sent_to_llm(router, text):
+    assert router.classify(text) is None
+
+
+@pytest.mark.parametrize('text, symbol', [
+    ('tell me about google', 'GOOGL'),
+    ('info on meta', 'META'),
+    ('tell me about infosys', 'INFY.BO'),
+])
+def test_search_args_find_the_stock(router, text, symbol):
+    """The routed /search arguments must match the stock literally (search does not take regexes)."""
+    intent, args = router.classify(text)
+    stocks = pd.read_csv(STOCKS).dropna(subset=['name'])
+    found = stocks[stocks['name'].str.lower().str.contains(' '.join(args), regex=False)]
+    assert symbol in found['symbol'].str.strip().tolist()